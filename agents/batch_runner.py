@@ -0,0 +1,61 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_crew(crew, max_rpm: Optional[int]):
+    """
+    A private copy of crew for one worker thread. max_rpm is passed to the Crew
+    constructor, which is where CrewAI builds its RPM controller; assigning it
+    on an existing crew has no effect.
+    """
+    worker_crew = crew.copy()
+    if not max_rpm:
+        return worker_crew
+    from crewai import Crew
+    return Crew(
+        agents=worker_crew.agents,
+        tasks=worker_crew.tasks,
+        process=worker_crew.process,
+        verbose=worker_crew.verbose,
+        max_rpm=max_rpm,
+    )
+
+
+def batch_kickoff(crew, inputs: List[dict], max_workers: int = 8, max_rpm: Optional[int] = None,
+                  return_exceptions: bool = False) -> List[Any]:
+    """
+    Kick off `crew` once per input row concurrently. Each worker thread runs its
+    rows on its own crew.copy(), so agents and tasks never share state between
+    concurrent kickoffs.
+
+    CrewAI's kickoff_for_each runs rows one after another even though the work
+    is I/O-bound; here the rows overlap on a thread pool. `max_rpm`, if given,
+    is the rate budget for the whole batch and is split across workers.
+    Results are returned in input order. With return_exceptions=True a failing
+    row yields its exception instead of aborting the batch; a crew that cannot
+    be copied always raises.
+    """
+    if not inputs:
+        return []
+    workers = max(1, min(max_workers, len(inputs)))
+    worker_rpm = max(1, max_rpm // workers) if max_rpm else None
+    local = threading.local()
+
+    def run(row: dict):
+        if not hasattr(local, "crew"):
+            local.crew = _worker_crew(crew, worker_rpm)
+        try:
+            return local.crew.kickoff(inputs=row)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            logger.exception("[Batch] Crew kickoff failed")
+            return e
+
+    logger.info(f"[Batch] Running {len(inputs)} kickoffs with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, inputs))
@@ -0,0 +1,181 @@
+import json
+import logging
+import threading
+from typing import List, Optional
+
+from cachetools import TTLCache
+
+from agents.email_agents import LLM_CLASSIFY, SHARED_PREFIX, load_prompt
+from agents.schemas import TaskRecords
+from tools.email_prefilter import should_skip
+
+logger = logging.getLogger(__name__)
+
+# Offline inbox sweeps (backfills, nightly ingestion) go through the OpenAI
+# Batch API: half the token price, no per-call HTTP overhead, results within
+# the completion window. Real-time webhooks keep the synchronous crew path.
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+# Every other status (completed, failed, expired, cancelled) is final.
+BATCH_PENDING_STATUSES = frozenset({"validating", "in_progress", "finalizing", "cancelling"})
+
+# Results of batches already collected, so repeated status polls return them
+# instead of downloading the files and storing every task again.
+_collected = TTLCache(maxsize=1024, ttl=7 * 24 * 60 * 60)
+_collect_lock = threading.Lock()
+
+# analyze_email_task and create_task_records_task folded into one request:
+# the model returns the task records directly instead of a numbered summary.
+ANALYZE_BATCH_SYSTEM = (
+    SHARED_PREFIX
+    + "\n\n# Role-specific\n"
+    + load_prompt("analyze_email_system.txt")
+    + "\n\nFor this job, return the tasks as JSON in 'tasks' instead of a summary: one object per task with "
+    "'title', 'detail' and 'due_at' (ISO 8601, resolved against the received date; null if no date is given). "
+    "Return an empty list if no human action is required."
+)
+
+
+def _client():
+    from openai import OpenAI
+    from tools.llm_http import get_llm_http_client
+    return OpenAI(http_client=get_llm_http_client())
+
+
+def _custom_id(email: dict) -> str:
+    return f"{email.get('userId') or ''}:{email['id']}"
+
+
+def _parse_custom_id(custom_id: str):
+    user_id, _, mail_id = custom_id.partition(":")
+    return mail_id, int(user_id) if user_id else None
+
+
+def build_batch_request(email: dict) -> dict:
+    """One JSONL line of the batch input file for a single email."""
+    return {
+        "custom_id": _custom_id(email),
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": LLM_CLASSIFY["model"],
+            "temperature": LLM_CLASSIFY["temperature"],
+            "messages": [
+                {"role": "system", "content": ANALYZE_BATCH_SYSTEM},
+                {"role": "user", "content": (
+                    "Email follows:\n"
+                    f"- received: {email.get('receivedDateTime', '')}\n"
+                    f"- subject: {email.get('subject', '')}\n"
+                    f"- preview: {email.get('bodyPreview', '')}\n"
+                    f"- from: {email.get('sender', '')}\n"
+                )},
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": "TaskRecords", "schema": TaskRecords.model_json_schema()},
+            },
+        },
+    }
+
+
+def sync_full_inbox(emails: List[dict]) -> Optional[str]:
+    """
+    Queue a batch job that extracts tasks from a whole mailbox sweep.
+
+    Automated and bulk mail is dropped by the prefilter first, exactly as on the
+    webhook path. Returns the batch id to pass to collect_analysis_batch(), or
+    None when nothing is left to submit.
+    """
+    kept = [email for email in emails if not should_skip(
+        email.get("sender", ""), email.get("subject", ""), email.get("internetMessageHeaders"),
+        receiver=email.get("receiver", ""),
+    )]
+    if not kept:
+        return None
+
+    lines = "\n".join(json.dumps(build_batch_request(email)) for email in kept)
+    client = _client()
+    input_file = client.files.create(file=("analyze_emails.jsonl", lines.encode("utf-8")), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"job": "analyze_email"},
+    )
+    logger.info(f"[Batch] Submitted {len(kept)} of {len(emails)} emails as batch {batch.id}")
+    return batch.id
+
+
+def _batch_lines(client, file_id: Optional[str]) -> List[dict]:
+    """Parsed JSONL lines of a batch file; an absent file (no successes, or no failures) has none."""
+    if not file_id:
+        return []
+    return [json.loads(line) for line in client.files.content(file_id).text.splitlines() if line.strip()]
+
+
+def _store_item(item: dict, stored: set) -> dict:
+    """
+    Store the tasks of one output or error line, as an {"id", "answer"} or {"id", "error"} dict.
+    Emails in `stored` already have tasks (an earlier collection) and are not stored again.
+    """
+    from tools.create_tasks_tool import create_tasks_from_summary
+
+    mail_id, user_id = _parse_custom_id(item["custom_id"])
+    if mail_id in stored:
+        return {"id": mail_id, "answer": "Tasks already stored."}
+    try:
+        if item.get("error"):
+            raise RuntimeError(item["error"])
+        response = item["response"]
+        if response.get("status_code") != 200:
+            raise RuntimeError(response.get("body", {}).get("error") or f"HTTP {response.get('status_code')}")
+        content = response["body"]["choices"][0]["message"]["content"]
+        records = TaskRecords.model_validate_json(content)
+        if not records.tasks:
+            return {"id": mail_id, "answer": "No human action is required."}
+        summary = json.dumps([task.model_dump() for task in records.tasks])
+        return {"id": mail_id, "answer": create_tasks_from_summary.run(summary=summary, id=mail_id, userId=user_id)}
+    except Exception as e:
+        logger.exception(f"[Batch] Failed to store tasks for email {mail_id}")
+        return {"id": mail_id, "error": str(e)}
+
+
+def collect_analysis_batch(batch_id: str) -> Optional[List[dict]]:
+    """
+    Store the tasks of a finished batch with create_tasks_from_summary.
+
+    Returns None while the batch is still running, otherwise one
+    {"id", "answer"} or {"id", "error"} dict per submitted email. Failed,
+    expired and cancelled batches are finished too: requests that completed
+    before the batch stopped are stored, the rest are returned as errors.
+    Safe to poll repeatedly: a collected batch returns its recorded results,
+    and emails that already have tasks are never stored twice.
+    """
+    with _collect_lock:
+        results = _collected.get(batch_id)
+        if results is not None:
+            return results
+
+        client = _client()
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in BATCH_PENDING_STATUSES:
+            logger.info(f"[Batch] Batch {batch_id} is {batch.status}")
+            return None
+        if batch.status != "completed":
+            logger.warning(f"[Batch] Batch {batch_id} ended as {batch.status}")
+
+        from db_utils import get_mail_ids_with_tasks
+
+        items = _batch_lines(client, batch.output_file_id) + _batch_lines(client, batch.error_file_id)
+        stored = get_mail_ids_with_tasks([_parse_custom_id(item["custom_id"])[0] for item in items])
+        results = [_store_item(item, stored) for item in items]
+
+        # Requests that appear in neither file never ran (failed validation, expired or cancelled)
+        answered = {item["custom_id"] for item in items}
+        for request in _batch_lines(client, batch.input_file_id):
+            if request["custom_id"] not in answered:
+                mail_id, _ = _parse_custom_id(request["custom_id"])
+                results.append({"id": mail_id, "error": f"Batch {batch.status} before this email was processed"})
+
+        _collected[batch_id] = results
+        return results
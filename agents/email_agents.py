@@ -1,422 +1,506 @@
+import os
+import sys
 import logging
-from crewai import Agent, Task, Crew, Process
-from tools.create_tasks_tool import create_tasks_from_summary
-from tools.natural_language_date_parser import NormalizeDueDatesTool
-from tools.send_email_tool import send_email
-from tools.get_receiver_email_tool import get_contact_email_by_name
-from tools.read_email_tool import read_email_by_task_id
-from tools.insert_email_tool import insert_email_record
-from tools.fetch_email_thread_tools import fetch_email_thread_tool
-from tools.getprofile_tool import get_user_profile_by_email
-from tools.reminder_task_tool import create_todo_task_tool
-from tools.create_calendar_event_tool import create_calendar_event_tool
-from tools.next_weekday_date_tool import next_weekday_date_tool
-from tools.reply_email_tool import reply_to_latest_email
-from tools.get_last_recipient_message_tool import get_last_recipient_message_tool
-from tools.update_draft_reply_tool import update_draft_reply_tool
-# Logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# --- Agents ---
-agent_manager = Agent(
-    role=" Email Controller and Router",
-    goal=" Ensure only relevant, actionable emails are routed to the appropriate agent, while ignoring noise.",
-    backstory="You are the intelligent gatekeeper of the system. Every incoming email first passes through you."
-    "With a combination of heuristic rules and smart judgment, you identify which emails are worth acting on"
-    "and which ones can be safely ignored. You prevent information overload by filtering out newsletters,"
-    "automated messages, and spam. Only emails that require human action are routed to the appropriate agent.",
-    memory=False,
-    verbose=False,
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-filter_and_route_email_task = Task(
-    description=(
-        "Given an incoming email event, determine whether it requires human action."
-        "Use heuristics (e.g., sender domain, subject line keywords like 'newsletter', etc.) and/or AI classification"
-        "to decide if the email is important and actionable."
-        
-        "- If the email is non-actionable (e.g., a newsletter or automated message), discard it."
-        "- If the email seems important and requires a response or human input, route it to the HumanActionAgent."
-        "Respect rate limits for how frequently AI models are called."
-        "Your job is to act as a smart filter and router for the incoming emails."
-    ),
-    expected_output="One of:\n"
-    "- Dropped: Non-actionable\n"
-    "- Routed to HumanActionAgent: [brief reasoning why it's important]",
-    agent=agent_manager,
-    input_keys=["summary", "id", "userId"]  # ✅ All are passed as input keys
-)
-
-
-human_action_agent = Agent(
-    role="Email Intelligence Agent",
-    goal="Analyze user input and extract actionable tasks with due dates, classify email type, and discard non-actionable ones.",
-    backstory="You're an elite assistant AI trained to comb through executive emails. With sharp insight, you turn requests into actionable items, identify deadlines, and make sure no important task goes unnoticed.",
-    memory=False,
-    verbose=False,
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2},
-    allow_delegation=False,
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping
+from tzlocal import get_localzone_name
+from agents.schemas import (
+    AnalyzedEmail, BulkCategories, DraftedEmail, EmailFields, EmailSummary, EventDetails, EventTime, TaskRecords, TodoReminder, Triage,
 )
 
+if TYPE_CHECKING:
+    from crewai import Agent
 
-analyze_email_task = Task(
-    description=(
-        """You are given an email and must identify and summarize any human-actionable items in it.
-
-Email:
-- mail_id: {id}
-- received: {receivedDateTime}
-- subject: {subject}
-- preview: {bodyPreview}
-- from: {sender}
+# Logging
+logger = logging.getLogger(__name__)
 
-Instructions:
-- Read the email content carefully.
-- Extract and clearly summarize all human-actionable tasks mentioned or implied in the message.
-- Focus only on what the recipient is being asked or expected to do.
-- Return your answer as a JSON object containing:
-  - "summary": the numbered list of tasks as a single string.
-  - "id": the `mail_id` value passed to you.
-  - "userId": the `userId` value passed to you. DO NOT infer this — just reuse the value.
-
-Example:
-{
-  "summary": "1. Do the thing\n2. Submit report",
-  "id": "{id}",
-  "userId": {userId}
-}
-
-If there is nothing actionable, return:
-{
-  "summary": "No human action is required.",
-  "id": "{id}",
-  "userId": {userId}
-}
-"""
-    ),
-    expected_output="JSON with keys: summary, id, userId",
-    agent=human_action_agent,
-    input_keys=["id", "receivedDateTime", "subject", "bodyPreview", "sender", "userId"]
-)
+PROMPTS_DIR = Path(__file__).parent / "prompts"
 
 
-task_manager_agent = Agent(
-    role="Task Manager",
-    goal="Save human-actionable tasks extracted from emails into the database.",
-    backstory=(
-        "You're responsible for taking summaries of human tasks extracted from emails and saving them as tasks with title, detail, due dates in our system. "
-        "You ensure that every actionable item is stored for follow-up."
-    ),
-    tools=[NormalizeDueDatesTool(), create_tasks_from_summary],
-    memory=False,
-    verbose=True,
-    allow_delegation=False,
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2}
-)
+def load_prompt(name: str) -> str:
+    """Read a static prompt from agents/prompts; kept out of task descriptions so it stays in the cached prefix."""
+    return (PROMPTS_DIR / name).read_text(encoding="utf-8").strip()
 
+# CrewAI verbose output writes to stdout synchronously on every step; keep it
+# off in production and opt in with CREWAI_VERBOSE=true when debugging.
+VERBOSE = os.getenv("CREWAI_VERBOSE", "false").strip().lower() in ("1", "true", "yes")
 
-create_task_records_task = Task(
-    description=(
-        "Create tasks in the database from the given summary. First normalize any natural language dates "
-        "like 'this Friday' using `normalize_due_dates`, then call `create_tasks_from_summary` with this structure:\n"
-        "{\n"
-        "  'summary': <summary>,\n"
-        "  'id': <id>,\n"
-        "  'userId': <userId>\n"
-        "}"
-    ),
-    expected_output=" A JSON list where each item contains: 'title', 'detail', and 'due_at' in ISO 8601 if available.",
-    agent=task_manager_agent,
-    input_keys=["summary", "id", "userId"]
-)
+# House rules shared by every agent. Providers key prompt caches on an exact
+# byte-identical prefix, so this block opens every backstory and the
+# role-specific text only follows it.
+SHARED_PREFIX = load_prompt("shared_prefix.txt")
 
+# Host timezone, resolved once per process (tzlocal walks /etc/localtime on every
+# call). It is baked into task descriptions rather than passed as an input so
+# they stay byte-identical across kickoffs.
+LOCAL_TZ = sys.intern(get_localzone_name())
 
-#=============== Email Reviewer ================
+# Model ids agents may use. Unknown ids are rejected at import time instead of
+# being silently routed to a (more expensive) default model.
+KNOWN_MODELS = {"gpt-4o-mini", "gpt-4o"}
 
-email_review_agent = Agent(
-    role="Email Reviewer",
-    goal="Ensure emails meet Nexius Labs quality standards.",
-    backstory="You carefully review every email for structure, tone, and clarity.",
-    memory=True,
-    verbose=True,
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.2},
-)
+# Shared read-only llm_config objects, so agents with the same settings pass
+# the very same model id and temperature instead of per-agent dict literals.
+LLM_CLASSIFY = MappingProxyType({"model": "gpt-4o-mini", "temperature": 0})  # classifiers and extractors
+LLM_DRAFT = MappingProxyType({"model": "gpt-4o-mini", "temperature": 0.2})   # reply drafting
+LABEL_ONLY = "Return ONLY one of the labels, with no explanation, reasoning, or punctuation."
 
-receiver_email_lookup_agent = Agent(
-    role="Receiver Email Lookup Agent",
-    goal="Validate or look up the recipient's email before proceeding.",
-    backstory="You verify the recipient's email or fetch it by contact name using Microsoft Graph.",
-    tools=[get_contact_email_by_name],
-    memory=False,
-    verbose=True,
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
+# Optional self-hosted OpenAI-compatible server (vLLM, llama.cpp) for low-stakes
+# conversational traffic. When LOCAL_LLM_BASE_URL is unset, gpt-4o-mini is used.
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "qwen2.5-1.5b-instruct")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "EMPTY")  # vLLM/llama.cpp accept any key unless started with one
+if LOCAL_LLM_BASE_URL:
+    KNOWN_MODELS.add(LOCAL_LLM_MODEL)
 
-#=============== Email Data Extractor ================
 
-email_data_extractor_agent = Agent(
-    role="Email Data Extractor",
-    goal="Extract structured email fields from reviewed email content.",
-    backstory="You're a parsing expert that can pull out structured fields like sender, receiver, subject, and content from reviewed, formatted email content.",
-    memory=False,
-    verbose=True,
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
+def model_name(model: str) -> str:
+    """Bare model id for the KNOWN_MODELS check ("openai/qwen2.5-1.5b-instruct" -> "qwen2.5-1.5b-instruct")."""
+    return model.removeprefix("openai/")
 
-#=============== Email Sender ================
 
-email_sender_agent = Agent(
-    role="Email Sender",
-    goal="Send approved emails using Microsoft Graph API securely and reliably.",
-    backstory="Handles final delivery of polished and validated emails via enterprise APIs.",
-    tools=[send_email],
-    memory=False,
-    verbose=True,
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
+def is_local_model(llm_config: Mapping) -> bool:
+    return bool(LOCAL_LLM_BASE_URL) and llm_config.get("api_base") == LOCAL_LLM_BASE_URL
 
-send_email_task = Task(
-    description="Send the finalized email via Microsoft Graph API. Include attachments from the context if any.",
-    expected_output="Confirmation message with email details or error.",
-    input_keys=["receiver", "sender", "subject", "content"],
-    context_keys=["attachments"],  # ✅ This is the missing link
-    agent=email_sender_agent,
-)
 
-email_sender_data_extractor_agent = Agent(
-    role="Email Sender Data Extractor",
-    goal="Extract receiver, subject, and body fields from formatted email content.",
-    backstory="You are a parsing and extraction expert specialized in processing formatted email text."
-    "Your goal is to accurately extract key email fields and return them in a structured JSON format."
-    "You must handle various formatting styles and always ensure clean and precise extraction.",
-    tools=[send_email],
-    memory=False,
-    verbose=True,
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
+def local_llm_config(temperature: float) -> dict:
+    """
+    llm_config for the local small model, or hosted gpt-4o-mini when none is configured.
+    LiteLLM cannot infer a provider from a bare local model id, so the server is
+    addressed as an OpenAI-compatible endpoint ("openai/<model>" plus api_base).
+    """
+    if LOCAL_LLM_BASE_URL:
+        return {
+            "model": f"openai/{LOCAL_LLM_MODEL}",
+            "api_base": LOCAL_LLM_BASE_URL,
+            "api_key": LOCAL_LLM_API_KEY,
+            "temperature": temperature,
+        }
+    return {"model": "gpt-4o-mini", "temperature": temperature}
+
+
+# Single-label classifiers (called through direct_completion, so the label is
+# the whole answer): a few tokens, no room for a rationale. With
+# LOCAL_LLM_CLASSIFIERS=true they go to the self-hosted server instead; run it
+# with speculative decoding (vLLM: --speculative-model <small draft model>
+# --num-speculative-tokens 4), which accepts almost every drafted token on
+# these few-token labels.
+LOCAL_LLM_CLASSIFIERS = os.getenv("LOCAL_LLM_CLASSIFIERS", "false").strip().lower() in ("1", "true", "yes")
+LLM_LABEL = MappingProxyType({
+    **(local_llm_config(0) if LOCAL_LLM_CLASSIFIERS else LLM_CLASSIFY),
+    "max_tokens": 8,
+})
+
+# Summarizer: temperature 0 plus a decode cap sized for a 2–3 sentence summary.
+# LOCAL_LLM_SUMMARIZER=true moves it to the self-hosted server; a 4-bit AWQ
+# 7–8B instruct model (vLLM: --quantization awq --enable-prefix-caching) is
+# plenty for fixed-format summaries. Check it on a holdout before switching.
+LOCAL_LLM_SUMMARIZER = os.getenv("LOCAL_LLM_SUMMARIZER", "false").strip().lower() in ("1", "true", "yes")
+LLM_SUMMARY = MappingProxyType({
+    **(local_llm_config(0) if LOCAL_LLM_SUMMARIZER else LLM_CLASSIFY),
+    "max_tokens": 160,
+})
+
+
+def json_output_config(llm_config: Mapping, schema_model) -> dict:
+    """
+    llm_config plus a response_format that constrains decoding to schema_model's
+    JSON schema, so output never needs a parse-failure retry. The pydantic class
+    itself is passed; LiteLLM and crewai.LLM turn it into the provider's
+    json_schema format. A local server may lack schema support and gets plain
+    JSON mode instead.
+    """
+    if is_local_model(llm_config):
+        return {**llm_config, "response_format": {"type": "json_object"}}
+    return {**llm_config, "response_format": schema_model}
 
-extract_email_sender_fields_task = Task(
-    description=""" Given a formatted {question} string and {sender_email} string, extract the following fields:
-    - sender → Extract from line starting with "From : "
-    - receiver → Extract from line starting with "To : "
-    - subject → Extract from line starting with "Subject : "
-    - body → All text after the subject line and blank line(s).
 
-    The final result MUST be valid JSON in this exact structure:
+def make_cached_agent(role: str, goal: str, backstory: str, llm_config: Mapping, **kwargs) -> "Agent":
+    """
+    Build an Agent whose role, goal and backstory form one static system block,
+    placed first in the messages list so the provider's automatic prompt caching reuses it.
+    Per-request data must only reach the model through task descriptions so the
+    prefix stays byte-identical between calls; SHARED_PREFIX opens every backstory.
+    Tools are sorted by name so their serialized schemas always come in the same order.
+    The settings in llm_config (model, temperature, max_tokens, response_format, ...)
+    reach the model through the crewai.LLM passed as the agent's llm.
+    """
+    if model_name(llm_config.get("model", "")) not in KNOWN_MODELS:
+        raise ValueError(f"Unknown model '{llm_config.get('model')}' for agent '{role.strip()}'")
+    if kwargs.get("tools"):
+        kwargs["tools"] = sorted(kwargs["tools"], key=lambda t: t.name)
+    params = dict(llm_config)
+    if is_local_model(llm_config):
+        # crewai.LLM rejects a response_format for models LiteLLM cannot confirm
+        # schema support for; the task's output_pydantic still parses the answer.
+        params.pop("response_format", None)
+    from crewai import Agent, LLM
+    return Agent(
+        role=role,
+        goal=goal,
+        backstory=SHARED_PREFIX + "\n\n# Role-specific\n" + backstory.strip(),
+        llm=LLM(**params),
+        **kwargs,
+    )
+
+
+def _label(answer: str) -> str:
+    return answer.strip().strip("'\".").lower()
+
+
+def direct_completion(system: str, prompt: str, llm_config: Mapping) -> str:
+    """
+    One chat completion through LiteLLM, without a CrewAI agent loop.
 
-    {
-      "sender": "...",
-      "receiver": "...",
-      "subject": "...",
-      "body": "..."
-    }
+    For single-shot classifiers that need no tools: the system block is built
+    exactly like make_cached_agent's backstory (SHARED_PREFIX first), so the
+    cached prefix is the same, and the answer is the model's raw content.
+    """
+    if model_name(llm_config.get("model", "")) not in KNOWN_MODELS:
+        raise ValueError(f"Unknown model '{llm_config.get('model')}'")
+    import litellm
+    response = litellm.completion(
+        messages=[
+            {"role": "system", "content": SHARED_PREFIX + "\n\n# Role-specific\n" + system.strip()},
+            {"role": "user", "content": prompt},
+        ],
+        **llm_config,
+    )
+    return response.choices[0].message.content or ""
 
-    Your final answer MUST be ONLY the JSON object, with no additional commentary.
+# --- Agents ---
+@lru_cache(maxsize=None)
+def get_agent_manager():
+    return make_cached_agent(
+        role=" Email Controller and Router",
+        goal=" Ensure only relevant, actionable emails are routed to the appropriate agent, while ignoring noise.",
+        backstory="You are the intelligent gatekeeper of the system. Every incoming email first passes through you."
+        "With a combination of heuristic rules and smart judgment, you identify which emails are worth acting on"
+        "and which ones can be safely ignored. You prevent information overload by filtering out newsletters,"
+        "automated messages, and spam. Only emails that require human action are routed to the appropriate agent.",
+        memory=False,
+        verbose=False,
+        llm_config=LLM_CLASSIFY,
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_filter_and_route_email_task():
+    from crewai import Task
+    return Task(
+        description=(
+            "Given an incoming email event, determine whether it requires human action."
+            "Use heuristics (e.g., sender domain, subject line keywords like 'newsletter', etc.) and/or AI classification"
+            "to decide if the email is important and actionable."
+        
+            "- If the email is non-actionable (e.g., a newsletter or automated message), discard it."
+            "- If the email seems important and requires a response or human input, route it to the HumanActionAgent."
+            "Respect rate limits for how frequently AI models are called."
+            "Your job is to act as a smart filter and router for the incoming emails."
+        ),
+        expected_output="One of:\n"
+        "- Dropped: Non-actionable\n"
+        "- Routed to HumanActionAgent: [brief reasoning why it's important]",
+        agent=get_agent_manager(),
+        input_keys=["summary", "id", "userId"]  # ✅ All are passed as input keys
+    )
+
+
+@lru_cache(maxsize=None)
+def get_human_action_agent():
+    return make_cached_agent(
+        role="Email Intelligence Agent",
+        goal="Analyze user input and extract actionable tasks with due dates, classify email type, and discard non-actionable ones.",
+        backstory=(
+            "You're an elite assistant AI trained to comb through executive emails. With sharp insight, you turn requests into actionable items, identify deadlines, and make sure no important task goes unnoticed.\n\n"
+            + load_prompt("analyze_email_system.txt")
+        ),
+        memory=False,
+        verbose=False,
+        llm_config=json_output_config(LLM_CLASSIFY, AnalyzedEmail),
+        allow_delegation=False,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_analyze_email_task():
+    from crewai import Task
+    return Task(
+        description="""Email follows:
+- mail_id: {id}
+- userId: {userId}
+- received: {receivedDateTime}
+- subject: {subject}
+- preview: {bodyPreview}
+- from: {sender}
+""",
+        expected_output="JSON with keys: summary, id, userId",
+        output_pydantic=AnalyzedEmail,
+        agent=get_human_action_agent(),
+        input_keys=["id", "receivedDateTime", "subject", "bodyPreview", "sender", "userId"]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_task_manager_agent():
+    from tools.natural_language_date_parser import NormalizeDueDatesTool
+    from tools.create_tasks_tool import create_tasks_from_summary
+    return make_cached_agent(
+        role="Task Manager",
+        goal="Save human-actionable tasks extracted from emails into the database.",
+        backstory=(
+            "You're responsible for taking summaries of human tasks extracted from emails and saving them as tasks with title, detail, due dates in our system. "
+            "You ensure that every actionable item is stored for follow-up."
+        ),
+        tools=[NormalizeDueDatesTool(), create_tasks_from_summary],
+        memory=False,
+        verbose=VERBOSE,
+        allow_delegation=False,
+        llm_config=LLM_CLASSIFY
+    )
+
+
+@lru_cache(maxsize=None)
+def get_create_task_records_task():
+    from crewai import Task
+    return Task(
+        description=(
+            "Create tasks in the database from the given summary. First normalize any natural language dates "
+            "like 'this Friday' using `normalize_due_dates`, then call `create_tasks_from_summary` with this structure:\n"
+            "{\n"
+            "  'summary': <summary>,\n"
+            "  'id': <id>,\n"
+            "  'userId': <userId>\n"
+            "}"
+        ),
+        expected_output="The created tasks, each with 'title', 'detail', and 'due_at' in ISO 8601 if available.",
+        output_pydantic=TaskRecords,
+        agent=get_task_manager_agent(),
+        input_keys=["summary", "id", "userId"]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_receiver_email_lookup_agent():
+    from tools.get_receiver_email_tool import get_contact_email_by_name
+    return make_cached_agent(
+        role="Receiver Email Lookup Agent",
+        goal="Validate or look up the recipient's email before proceeding.",
+        backstory="You verify the recipient's email or fetch it by contact name using Microsoft Graph.",
+        tools=[get_contact_email_by_name],
+        memory=False,
+        verbose=VERBOSE,
+        llm_config=LLM_CLASSIFY,
+        allow_delegation=False,
+    )
 
-    Here is the formatted question and sender email:
+#=============== Email Sender ================
 
+@lru_cache(maxsize=None)
+def get_email_sender_agent():
+    from tools.send_email_tool import send_email
+    return make_cached_agent(
+        role="Email Sender",
+        goal="Send approved emails using Microsoft Graph API securely and reliably.",
+        backstory="Handles final delivery of polished and validated emails via enterprise APIs.",
+        tools=[send_email],
+        memory=False,
+        verbose=VERBOSE,
+        llm_config=LLM_CLASSIFY,
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_send_email_task():
+    from crewai import Task
+    return Task(
+        description="Send the finalized email via Microsoft Graph API. Include attachments from the context if any.",
+        expected_output="Confirmation message with email details or error.",
+        input_keys=["receiver", "sender", "subject", "content"],
+        context_keys=["attachments"],  # ✅ This is the missing link
+        agent=get_email_sender_agent(),
+    )
+
+@lru_cache(maxsize=None)
+def get_email_sender_data_extractor_agent():
+    from tools.email_field_regex import extract_email_fields_deterministic
+    return make_cached_agent(
+        role="Email Sender Data Extractor",
+        goal="Extract receiver, subject, and body fields from formatted email content.",
+        backstory="You are a parsing and extraction expert specialized in processing formatted email text."
+        "Your goal is to accurately extract key email fields and return them in a structured JSON format."
+        "You must handle various formatting styles and always ensure clean and precise extraction.",
+        tools=[extract_email_fields_deterministic],
+        memory=False,
+        verbose=VERBOSE,
+        llm_config=json_output_config(LLM_CLASSIFY, EmailFields),
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_extract_email_sender_fields_task():
+    from crewai import Task
+    return Task(
+        description=""" From the formatted email and sender email below, extract:
+    - sender → from the line starting with "From : ", or the sender email if there is none
+    - receiver → from the line starting with "To : "
+    - subject → from the line starting with "Subject : "
+    - body → all text after the subject line and blank line(s).
+
+    Formatted email:
     {question}
-    {sender_email}""",
-    expected_output="A valid JSON object with sender, receiver, subject, and body fields.",
-    input_keys=["sender_email","question"],
-    output_keys=["sender", "receiver", "subject", "body"],
-    agent=email_sender_agent,
-)
+
+    Sender email: {sender_email}""",
+        expected_output="sender, receiver, subject and body.",
+        input_keys=["sender_email","question"],
+        output_keys=["sender", "receiver", "subject", "body"],
+        output_pydantic=EmailFields,
+        agent=get_email_sender_data_extractor_agent(),
+    )
 
 #=========== Conversation ============
 
-email_support_conversation_agent = Agent(
-
-    role="Customer Support Email Assistant",
-    goal=(
-        "Provide helpful, natural, and polite responses to questions related to email communication "
-        "and general customer support conversation (e.g. availability, greetings, gratitude). "
-        "Respond conversationally when appropriate. Politely decline if the topic is not relevant."
-    ),
-    backstory=(
-        "You are a smart, friendly assistant who specializes in helping users with writing professional emails in 24/7 "
-        "and engaging in light, polite customer support conversation. "
-        "You're designed to feel human, understand common phrasing, and provide short but useful answers. "
-        "If something is outside your expertise (e.g. math, tech, personal help), you gently decline."
-    ),
-    memory=True,
-    verbose=False,
-    llm_config={"model": "gpt-4o", "temperature": 0.6},
-    allow_delegation=False,
-)
+@lru_cache(maxsize=None)
+def get_email_support_conversation_agent():
+    return make_cached_agent(
+
+        role="Customer Support Email Assistant",
+        goal=(
+            "Provide helpful, natural, and polite responses to questions related to email communication "
+            "and general customer support conversation (e.g. availability, greetings, gratitude). "
+            "Respond conversationally when appropriate. Politely decline if the topic is not relevant."
+        ),
+        backstory=(
+            "You are a smart, friendly assistant who specializes in helping users with writing professional emails in 24/7 "
+            "and engaging in light, polite customer support conversation. "
+            "You're designed to feel human, understand common phrasing, and provide short but useful answers. "
+            "If something is outside your expertise (e.g. math, tech, personal help), you gently decline."
+        ),
+        memory=False,  # bounded history is passed in through the task instead
+        verbose=False,
+        llm_config=local_llm_config(temperature=0.6),
+        allow_delegation=False,
+    )
 
 
 
 #============ Draft Writer Agent and Task =============
 
-email_drafting_agent = Agent(
-    role="Email Drafter and Formatter",
-    goal="Create a properly structured professional email based on user instruction and recipient profile.",
-    backstory=(
-        "You're a communication specialist for Nexius Labs. "
-        "You write highly personalized professional emails by first learning about the recipient using their profile. "
-        "You adapt tone, content, and style accordingly."
-    ),
-    memory=True,
-    verbose=True,
-    tools=[get_user_profile_by_email],   # <-- adding your tool!
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.3},
-)
-
-process_email_task = Task(
-    description="""
-From the following user instruction, do the following:
-1. Extract the recipient's name or email.
-2. Use the get_user_profile_by_email tool to fetch the sender's profile by their email (sender_email).
-3. Analyze the profile to understand their persona — e.g. role, seniority, department, interests (theme, language).
-4. Infer an appropriate subject line from the context and profile.
-5. Write a professional business email body using Nexius Labs' tone and adapted to the sender's persona.
-6. Ensure the message ends with a signature that includes the sender's name (parsed from sender_email) and the company name 'Nexius Labs'.
-
-
-Signature format example:
-Best regards,  
-John Doe  
-Program Coordinator
-Nexius Labs
-
-If you can't infer the name from the sender_email, use:
-Best regards,  
-Nexius Labs Team
-
-Input:
-User instruction: {question}  
+@lru_cache(maxsize=None)
+def get_composite_drafting_agent():
+    return make_cached_agent(
+        role="Email Drafter and Reviewer",
+        goal="Create a properly structured professional email based on user instruction and recipient profile, reviewed and ready to send.",
+        backstory=(
+            "You're a communication specialist for Nexius Labs. "
+            "You write highly personalized professional emails by first learning about the recipient using their profile. "
+            "You adapt tone, content, and style accordingly, and you review every draft for structure, tone, and clarity "
+            "against Nexius Labs quality standards before handing it over.\n\n"
+            + load_prompt("compose_email_system.txt")
+        ),
+        memory=False,
+        verbose=VERBOSE,
+        llm_config=json_output_config({"model": "gpt-4o-mini", "temperature": 0.3}, DraftedEmail),
+    )
+
+@lru_cache(maxsize=None)
+def get_compose_email_task():
+    from crewai import Task
+    return Task(
+        description="""User instruction: {question}
 Sender Email: {sender_email}
-
-Return a **valid JSON**:
-{
-  "receiver": "<recipient name or email>",
-  "subject": "<email subject>",
-  "content": "<email body with signature>",
-  "sender": "{sender_email}",
-  "job_title": "<job title>",
-  "attachments": "<list of attachments>"
-}
+Sender Profile:
+{sender_profile}
 """,
-    expected_output="Valid JSON with receiver, subject, content, and sender.",
-    input_keys=["question", "sender_email"],
-    output_keys=["receiver", "subject", "content", "sender", "attachments"],
-    agent=email_drafting_agent
-)
-
-
-lookup_receiver_email_task = Task(
-    description="""
-If 'receiver' is not an email address, look up the real email using the contact tool.
-Return updated JSON or error JSON if not found.
+        expected_output="JSON with receiver, subject, content, sender, attachments, passes_review and review_notes.",
+        input_keys=["question", "sender_email", "sender_profile"],
+        output_keys=["receiver", "subject", "content", "sender", "attachments", "passes_review", "review_notes"],
+        output_pydantic=DraftedEmail,
+        agent=get_composite_drafting_agent()
+    )
+
+
+@lru_cache(maxsize=None)
+def get_lookup_receiver_email_task():
+    from crewai import Task
+    return Task(
+        description="""
+The recipient '{receiver}' is not an email address. Look up the real email using the contact tool.
+Return JSON {"receiver": "<email address>"} or error JSON if not found.
 """,
-    expected_output="Updated JSON or error JSON",
-    input_keys=["receiver", "sender", "subject", "content"],
-    output_keys=["receiver", "sender", "subject", "content"],
-    agent=receiver_email_lookup_agent,
-)
-
-review_email_task = Task(
-    description="""
-Check email draft for correctness, structure, tone, and missing fields. Return original or correction feedback.
-""",
-    expected_output="If valid, return JSON; if not, return detailed feedback for redrafting.",
-    input_keys=["receiver", "sender", "subject", "content"],
-    output_keys=["receiver", "sender", "subject", "content"],
-    agent=email_review_agent,
-)
-
-
-restore_attachments_task = Task(
-    description="Re-attach the originally uploaded attachments to the finalized email before sending. Do not change or generate attachments.",
-    expected_output="Structured email JSON with original attachments added back in.",
-    input_keys=["receiver", "sender", "subject", "content", "attachments"],
-    output_keys=["receiver", "sender", "subject", "content", "attachments"],
-    context_keys=["attachments"],  # ✅ pulled from kickoff context
-    agent=email_sender_agent,
-    async_execution=False
-)
-
-extract_email_fields_task = Task(
-    description="""
-Take the reviewed email content and extract the following fields:
-- sender
-- receiver
-- subject
-- content
-
-Return the result as valid **JSON** with this structure:
-{
-  "sender": "...",
-  "receiver": "...",
-  "subject": "...",
-  "content": "..."
-}
-""",
-    expected_output="Valid JSON with sender, receiver, subject, content.",
-    input_keys=["receiver", "sender", "subject", "content"],
-    output_keys=["sender", "receiver", "subject", "content"],
-    agent=email_data_extractor_agent
-)
-
-
-
-email_conversation_task = Task(
-    description=(
-        "You're a smart, human-like assistant who only reply warmly and briefly to casual user messages.."
-        "If it's a question outside your scope (e.g., math, trivia, news, programming, general info), do NOT redirect. Instead:\n"
-        "    - Politely decline.\n"
-        "    - Say you are not able to answer that because your focus is only on email writing and communication.\n"
-        "    - Use natural, varied language. Do NOT say the same thing every time.\n\n"
-        "Make sure your response is always clear, honest, brief, and polite."
-    ),
-    expected_output="A polite, direct, natural-sounding sentence — answering clearly or gracefully declining.",  
-    agent=email_support_conversation_agent
-)
+        expected_output="Updated JSON or error JSON",
+        input_keys=["receiver"],
+        output_keys=["receiver"],
+        agent=get_receiver_email_lookup_agent(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_restore_attachments_task():
+    from crewai import Task
+    return Task(
+        description="Re-attach the originally uploaded attachments to the finalized email before sending. Do not change or generate attachments.",
+        expected_output="Structured email JSON with original attachments added back in.",
+        input_keys=["receiver", "sender", "subject", "content", "attachments"],
+        output_keys=["receiver", "sender", "subject", "content", "attachments"],
+        context_keys=["attachments"],  # ✅ pulled from kickoff context
+        agent=get_email_sender_agent(),
+        async_execution=False
+    )
+
+@lru_cache(maxsize=None)
+def get_email_conversation_task():
+    from crewai import Task
+    return Task(
+        description=(
+            "You're a smart, human-like assistant who only reply warmly and briefly to casual user messages.."
+            "If it's a question outside your scope (e.g., math, trivia, news, programming, general info), do NOT redirect. Instead:\n"
+            "    - Politely decline.\n"
+            "    - Say you are not able to answer that because your focus is only on email writing and communication.\n"
+            "    - Use natural, varied language. Do NOT say the same thing every time.\n\n"
+            "Make sure your response is always clear, honest, brief, and polite.\n\n"
+            "Earlier in this conversation:\n{history}\n\n"
+            "Message: {question}"
+        ),
+        expected_output="A polite, direct, natural-sounding sentence — answering clearly or gracefully declining.",  
+        input_keys=["question", "history"],
+        agent=get_email_support_conversation_agent()
+    )
 
 
 #=============== Draft Reply ================
 
-draft_reply_agent = Agent(
-    role="Email Draft Specialist",
-    goal="Generate accurate, professional, and context-appropriate email replies.",
-    backstory="You are a language-savvy assistant with exceptional written communication skills. "
-              "Your purpose is to streamline email communication by drafting high-quality responses "
-              "that maintain proper tone, structure, and clarity.",
-    memory=False,
-    verbose=True,
-    tools=[fetch_email_thread_tool, get_user_profile_by_email, get_last_recipient_message_tool],
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-generate_email_reply_task = Task(
-    description="""
+@lru_cache(maxsize=None)
+def get_draft_reply_agent():
+    return make_cached_agent(
+        role="Email Draft Specialist",
+        goal="Generate accurate, professional, and context-appropriate email replies.",
+        backstory="You are a language-savvy assistant with exceptional written communication skills. "
+                  "Your purpose is to streamline email communication by drafting high-quality responses "
+                  "that maintain proper tone, structure, and clarity.",
+        memory=False,
+        verbose=VERBOSE,
+        llm_config=LLM_DRAFT,
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_generate_email_reply_task():
+    from crewai import Task
+    return Task(
+        description="""
 Your objective is to draft a professional and context-aware reply to the most recent message in an email thread.
+The thread, the last message not sent by the user, and the user's profile are given below; do not fetch them again.
 
 Steps:
 
-1. Use the `fetch_email_thread_by_task_id_tool` to get the entire email thread.
-   Input: {"mail_id": {mail_id}, "sender_email": {sender_email}}
-
-2. Use `get_last_recipient_message_tool` with:
-   Input: {"user_email": {sender_email}, "mail_id": {mail_id}}
-   to isolate the last message in the thread not sent by the user.
+1. Analyze the conversation thread (for full context) and the latest recipient message (for precise content reference).
 
-3. Use `get_user_profile_by_email`:
-   Input: {"email": {sender_email}}  
-   Extract details like: Display Name, Job Title, Department, Theme, and Language to adapt the tone of the reply.
+2. Use the user's profile (Display Name, Job Title, Department, Theme, Language) to adapt the tone of the reply.
 
-4. Analyze the conversation thread (for full context) and the latest recipient message (for precise content reference).
-
-5. Generate a reply that:
+3. Generate a reply that:
    - Starts with a polite greeting.
    - Responds accurately to the last message's content.
    - Maintains professional and appropriate tone based on the user's profile.
@@ -428,48 +512,55 @@ Best regards,
 Henry
 
 Your final answer MUST be only the full plain text email reply.
+
+Email thread:
+{thread}
+
+Last recipient message:
+{last_message}
+
+User profile:
+{profile}
 """,
-    input_keys=["mail_id", "sender_email"],
-    expected_output="Plain text reply email.",
-    agent=draft_reply_agent
-)
+        input_keys=["mail_id", "sender_email", "thread", "last_message", "profile"],
+        expected_output="Plain text reply email.",
+        agent=get_draft_reply_agent()
+    )
 
 
 #=============== Auto Draft Reply ================
 
-auto_draft_reply_agent = Agent(
-    role="Email Draft Specialist",
-    goal="Generate accurate, professional, and context-appropriate email replies.",
-    backstory="You are a language-savvy assistant with exceptional written communication skills. "
-              "Your purpose is to streamline email communication by drafting high-quality responses "
-              "that maintain proper tone, structure, and clarity.",
-    memory=False,
-    verbose=True,
-    tools=[fetch_email_thread_tool, get_user_profile_by_email, get_last_recipient_message_tool, update_draft_reply_tool],
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-auto_email_draft_reply_task = Task(
-    description="""
+@lru_cache(maxsize=None)
+def get_auto_draft_reply_agent():
+    from tools.update_draft_reply_tool import update_draft_reply_tool
+    return make_cached_agent(
+        role="Email Draft Specialist",
+        goal="Generate accurate, professional, and context-appropriate email replies.",
+        backstory="You are a language-savvy assistant with exceptional written communication skills. "
+                  "Your purpose is to streamline email communication by drafting high-quality responses "
+                  "that maintain proper tone, structure, and clarity.",
+        memory=False,
+        verbose=VERBOSE,
+        tools=[update_draft_reply_tool],
+        llm_config=LLM_DRAFT,
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_auto_email_draft_reply_task():
+    from crewai import Task
+    return Task(
+        description="""
 Your objective is to draft a professional and context-aware reply to the most recent message in an email thread.
+The thread, the last message not sent by the user, and the user's profile are given below; do not fetch them again.
 
 Steps:
 
-1. Use the `fetch_email_thread_by_task_id_tool` to get the entire email thread.
-   Input: {"mail_id": {mail_id}, "sender_email": {receiver}}
-
-2. Use `get_last_recipient_message_tool` with:
-   Input: {"user_email": {receiver}, "mail_id": {mail_id}}
-   to isolate the last message in the thread not sent by the user.
-
-3. Use `get_user_profile_by_email`:
-   Input: {"email": {receiver}}  
-   Extract details like: Display Name, Job Title, Department, Theme, and Language to adapt the tone of the reply.
+1. Analyze the conversation thread (for full context) and the latest recipient message (for precise content reference).
 
-4. Analyze the conversation thread (for full context) and the latest recipient message (for precise content reference).
+2. Use the user's profile (Display Name, Job Title, Department, Theme, Language) to adapt the tone of the reply.
 
-5. Generate a reply that:
+3. Generate a reply that:
    - Starts with a polite greeting.
    - Responds accurately to the last message's content.
    - Maintains professional and appropriate tone based on the user's profile.
@@ -480,80 +571,55 @@ End the reply with:
 Best regards,  
 Henry
 
-Your final answer MUST be only the full plain text email reply.
-6. Use `update_draft_reply_tool` to update the draft reply in the database.
+4. Use `update_draft_reply_tool` to update the draft reply in the database.
 Input: {"mail_id": {mail_id}, "ai_draft_reply": <the generated reply>}
-""",
-    input_keys=["mail_id", "receiver"],
-    expected_output="Plain text reply email.",
-    agent=auto_draft_reply_agent
-)
-
-
-
-#============== Email Format Agent ===============
-
-email_format_agent = Agent(
-    role="Email Format Specialist",
-    goal=" Convert structured email JSON data into a properly formatted email content string.",
-    backstory=" You are an expert at taking structured data (like JSON) and transforming it into professional, clearly formatted email content.You always ensure the formatting is precise and matches the requested style.",
-    memory=False,
-    verbose=True,
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-email_format_task = Task(
-    description="""
-   Given the following fields extracted from an email:
-
-
-    - receiver
-    - subject
-    - content
-
-    Format them into a clean email string following this exact format:
-
-
 
-    To : receiver,
+Your final answer MUST be only the full plain text email reply.
 
-    Subject : subject,
+Email thread:
+{thread}
 
-    content
+Last recipient message:
+{last_message}
 
-    Use two line breaks between the header (From/To/Subject) and the email body.
+User profile:
+{profile}
+""",
+        input_keys=["mail_id", "receiver", "thread", "last_message", "profile"],
+        expected_output="Plain text reply email.",
+        agent=get_auto_draft_reply_agent()
+    )
 
-    Your final answer MUST be only the formatted email string exactly matching the above format, with no extra commentary.
 
-    """,
-    expected_output="A string of the formatted email exactly matching the provided format.",
-    input_keys=["receiver", "subject", "content"],
-    output_keys=["formatted_email"],
-    agent=email_format_agent
-)
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 2) Email Reader Agent and Task
 # ────────────────────────────────────────────────────────────────────────────────
 
-email_reader_agent = Agent(
-    role="Email Reader",
-    goal="Fetch the full email body, subject, sender, timestamp, and attachments given a mail ID.",
-    backstory=(
-        "You are a utility agent that reads emails via Microsoft Graph. "
-        "When given a mail_id and user_id, you call the `read_email_by_task_id` tool "
-        "to retrieve the complete email contents."
-    ),
-    memory=False,
-    verbose=False,
-    tools=[read_email_by_task_id],
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.0},
-    allow_delegation=False,
-)
-
-read_email_task = Task(
-    description="""
+@lru_cache(maxsize=None)
+def get_email_reader_agent():
+    from tools.read_email_tool import read_email_by_task_id
+    return make_cached_agent(
+        role="Email Reader",
+        goal="Fetch the full email body, subject, sender, timestamp, and attachments given a mail ID.",
+        backstory=(
+            "You are a utility agent that reads emails via Microsoft Graph. "
+            "When given a mail_id and user_id, you call the `read_email_by_task_id` tool "
+            "to retrieve the complete email contents. To read several emails, pass all of their "
+            "task IDs as a list in a single call."
+        ),
+        memory=False,
+        verbose=False,
+        tools=[read_email_by_task_id],
+        llm_config=LLM_CLASSIFY,
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_read_email_task():
+    from crewai import Task
+    return Task(
+        description="""
 Use the `read_email_by_task_id` tool to fetch the full email.
 Input: {"mail_id": <Graph Email ID>, "user_id": <internal user ID>}
 Output: A dictionary with keys:
@@ -565,10 +631,10 @@ Output: A dictionary with keys:
       "attachments": <list of attachment metadata>
     }
 """,
-    input_keys=["mail_id", "user_id"],
-    expected_output="Dictionary containing full email content.",
-    agent=email_reader_agent
-)
+        input_keys=["mail_id", "user_id"],
+        expected_output="Dictionary containing full email content.",
+        agent=get_email_reader_agent()
+    )
 
 
 
@@ -576,288 +642,207 @@ Output: A dictionary with keys:
 # 3) Reminder Agent and Task
 # ────────────────────────────────────────────────────────────────────────────────
 
-reminder_agent = Agent(
-    role="Reminder Agent",
-    goal="Classify whether a user's request is for a TODO task or a Calendar Event.",
-    backstory="""You are an intelligent router agent. 
-    Given a question, your job is to classify whether it is asking to create:
-    - a personal task or reminder → 'todo'
-    - a calendar event → 'event'
-    You only output one of these two labels: 'todo' or 'event'.""",
-    memory=False,
-    verbose=False,
-    tools=[],  # no tools, pure classification
-    llm_config={"model": "gpt-4o-mini", "temperature": 0},
-    allow_delegation=False,
-)
+REMINDER_TYPE_RULES = """You are an intelligent router agent.
+Classify the question into one of these two categories:
+- 'todo' → if the question is about creating a personal task or reminder
+- 'event' → if the question is about creating a calendar event with time, date, attendees, or location.
 
-reminder_task = Task(
-    description="""
-    Given the following question: {question}
+Your answer MUST be ONLY the string 'todo' or 'event' — no explanations, no other text."""
 
-    Classify it into one of these two categories:
-    - 'todo' → if the question is about creating a personal task or reminder
-    - 'event' → if the question is about creating a calendar event with time, date, attendees, or location.
 
-    Your final answer MUST be ONLY the string 'todo' or 'event' — no explanations, no other text.
-    """,
-    input_keys=["question"],
-    expected_output="'todo' or 'event'",
-    agent=reminder_agent
-)
+def classify_reminder_direct(question: str) -> str:
+    """'todo' or 'event' for a reminder request (direct_completion, no crew)."""
+    return _label(direct_completion(REMINDER_TYPE_RULES, f"Question: {question}", LLM_LABEL))
 
 
 #============ Reminder Todo Task =============
 
-reminder_todo_formatter_preview_agent = Agent(
-    role="TODO Task Formatter Preview Agent",
-    goal="Extract task details from natural language input and format a human-friendly preview.",
-    backstory="""You are a helpful assistant specialized in taking natural language questions for personal tasks
-    and turning them into a clean, readable TODO preview.
-
-    You will:
-    - Extract the main action as Title
-    - Infer any implied additional details as Body (if none are provided, leave blank or a reasonable default)
-    - Determine Due Date — if a date is mentioned, parse it and format it as 'YYYY-MM-DD HH:MM UTC'; if no date is mentioned, use today's date in UTC.
-
-    You will format the extracted data as:
-    Title: <title>
-    Body: <body>
-    Due Date: <due_date_time formatted>
-    """,
-    memory=False,
-    verbose=False,
-    tools=[],  # No tools needed
-    llm_config={"model": "gpt-4o-mini", "temperature": 0},
-    allow_delegation=False,
-)
-
-
-reminder_todo_formatter_preview_task = Task(
-    description="""
-    Today's date is: {current_date}
-
-    Given the following inputs:
-    - sender: {sender}
-    - question: {question}
-
-    You will extract the following:
-    - Title: the main action the user wants to do
-    - Body: any additional implied details or instructions. If none are provided, infer a helpful description.
-    - Due Date: if a date is mentioned, parse it and format it as 'YYYY-MM-DD HH:MM UTC';
-      if no date is mentioned, use today's date ({current_date}).
-
-    Your final output MUST be exactly in this text format:
-
-    Title: <title>
-    Body: <body>
-    Due Date: <due_date_time formatted as 'YYYY-MM-DD HH:MM UTC'>
-
-    No extra explanations or text — just the formatted preview.
-    """,
-    input_keys=["sender", "question", "current_date"],
-    expected_output="A human-friendly preview in the required text format.",
-    agent=reminder_todo_formatter_preview_agent
-)
-
-
-reminder_todo_agent = Agent(
-    role="Personal Task Extraction and Reminder Agent",
-    goal="Help users remember important tasks by extracting structured task details from their natural language questions and creating reminders in Microsoft To Do.",
-    backstory="You are a helpful assistant integrated with Microsoft Graph API. You specialize in understanding natural language requests for task creation. "
-    "You will parse the input question and extract:"
-    "- task_title (what should be done)"
-    "- task_body (if there is more detail implied)"
-    "- due_date_time (if not provided, use today's date)"
-    "- email (from sender)"
-    "After extracting this information, you will call the create_todo_task tool.",
-    memory=False,
-    verbose=False,
-    tools=[create_todo_task_tool],
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-reminder_todo_task = Task(
-    description="""
-     Given the {sender} and a natural language {question}, extract the following fields:
+@lru_cache(maxsize=None)
+def get_reminder_todo_agent():
+    from tools.reminder_task_tool import create_todo_task_tool
+    return make_cached_agent(
+        role="Personal Task Extraction and Reminder Agent",
+        goal="Help users remember important tasks by extracting structured task details from their natural language questions and creating reminders in Microsoft To Do.",
+        backstory="You are a helpful assistant integrated with Microsoft Graph API. You specialize in understanding natural language requests for task creation. "
+        "You will parse the input question and extract:"
+        "- task_title (what should be done)"
+        "- task_body (if there is more detail implied)"
+        "- due_date_time (if not provided, use today's date)"
+        "- email (from sender)"
+        "After extracting this information, you will call the create_todo_task tool.",
+        memory=False,
+        verbose=False,
+        tools=[create_todo_task_tool],
+        llm_config=LLM_CLASSIFY,
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_reminder_todo_task():
+    from crewai import Task
+    return Task(
+        description="""
+    From the sender and the natural language question below, extract the following fields:
     - email: the sender
     - task_title: the main action the user wants to do
-    - task_body: any optional details implied in the question
-    - due_date_time: if a date is mentioned, convert it to ISO format YYYY-MM-DDTHH:MM:SS in UTC timezone.  if no date is mentioned, use today's date ({current_date}).
+    - task_body: any optional details implied in the question. If none are provided, infer a helpful description.
+    - due_date_time: if a date is mentioned, convert it to ISO format YYYY-MM-DDTHH:MM:SS in UTC timezone.  if no date is mentioned, use today's date.
 
     After extracting the above fields, call the create_todo_task tool with them.
 
-    Your final answer MUST be a confirmation string showing which task was created and its due date.
-    """,
-    input_keys=["sender", "question", "current_date"],
-    expected_output="Confirmation message including created task title and due date.",
-    agent=reminder_todo_agent
-)
-
-#============ Reminder Event Task =============
-
-event_formatter_preview_agent = Agent(
-    role="Event Formatter Preview Agent",
-    goal="Extract event details from natural language input and format a human-friendly preview.",
-    backstory="""You are an expert assistant who understands event descriptions provided in natural language.
-
-    You will extract the following event details:
-    - Subject
-    - Start DateTime (in 'YYYY-MM-DD HH:MM' format + Timezone)
-    - End DateTime (in 'YYYY-MM-DD HH:MM' format + Timezone)
-    - Location
-    - Attendees (comma-separated list of email addresses)
+    Your final answer MUST be JSON with task_title, task_body, due_date_time and confirmation
+    (the string the tool returned). Do not write a preview; it is rendered from these fields.
 
-    You will output these fields in a human-friendly formatted text preview.
-    """,
-    memory=False,
-    verbose=False,
-    tools=[],  # No tools, pure formatting
-    llm_config={"model": "gpt-4o-mini", "temperature": 0},
-    allow_delegation=False,
-)
-event_formatter_preview_task = Task(
-    description="""
-    Given the following inputs:
+    Inputs:
     - sender: {sender}
+    - today's date: {current_date}
     - question: {question}
-
-    You will extract the following event details:
-    - Subject: the name or title of the event
-    - Start DateTime: in 'YYYY-MM-DD HH:MM' format plus the provided timezone
-    - End DateTime: in 'YYYY-MM-DD HH:MM' format plus the provided timezone
-    - Location: the location where the event will take place
-    - Timezone: local timezone
-    - Attendees: comma-separated list of email addresses of attendees
-
-    Your final output MUST be exactly in this text format:
-
-    Subject: <subject>
-    Start DateTime: <start_datetime + timezone>
-    End DateTime: <end_datetime + timezone>
-    Timezone: <timezone>
-    Location: <location>
-    Attendees: <attendee1>, <attendee2>, ...
-
-    No extra explanations or text — just the formatted preview.
     """,
-    input_keys=["sender", "question"],
-    expected_output="A human-friendly preview of the event in the required text format.",
-    agent=event_formatter_preview_agent
-)
-
-reminder_event_agent = Agent(
-    role="Reminder Event Agent",
-    goal="  Extract calendar event details from user input and create the event in Microsoft 365 Calendar.",
-    backstory=""" You are an expert assistant capable of parsing natural language inputs for calendar events.
-    You understand dates, times, locations, and attendees, and can seamlessly create calendar events on behalf of the user.
-    """,
-    memory=False,
-    verbose=False,
-    tools=[create_calendar_event_tool,next_weekday_date_tool],
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-from tzlocal import get_localzone_name
+        input_keys=["sender", "question", "current_date"],
+        expected_output="JSON with task_title, task_body, due_date_time and confirmation.",
+        output_pydantic=TodoReminder,
+        agent=get_reminder_todo_agent()
+    )
 
-local_tz = get_localzone_name()
-
-reminder_event_task = Task(
-    description="""
-description: |
-  You will receive a {question} describing an event (such as a meeting or appointment) and - {sender} is the sender's email used for scheduling.
-
-  Your job is to extract the following fields:
-  - Sender
-  - Subject of the event
-  - Start datetime (in ISO format)
-  - End datetime (in ISO format)
-  - Location of the event
-  - Timezone of user
-  - Attendees (comma-separated email addresses)
+#============ Reminder Event Task =============
+# Event extraction runs as two independent calls that crew.create_event() issues
+# concurrently: the date/time reasoning (with NextWeekdayDateTool) and the plain
+# subject/location/attendee extraction. Python merges them and creates the event.
+
+@lru_cache(maxsize=None)
+def get_reminder_event_time_agent():
+    from tools.next_weekday_date_tool import next_weekday_date_tool
+    return make_cached_agent(
+        role="Event Time Agent",
+        goal="Work out the start, end and timezone of a calendar event described in natural language.",
+        backstory="You are an expert at resolving dates and times: weekdays, relative dates, time ranges and misspellings.",
+        memory=False,
+        verbose=False,
+        tools=[next_weekday_date_tool],
+        llm_config=json_output_config(LLM_CLASSIFY, EventTime),
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_reminder_event_details_agent():
+    return make_cached_agent(
+        role="Event Details Agent",
+        goal="Extract the subject, location and attendees of a calendar event described in natural language.",
+        backstory="You are an expert at picking out who, what and where from event requests.",
+        memory=False,
+        verbose=False,
+        tools=[],  # no tools, pure extraction
+        llm_config=json_output_config(LLM_CLASSIFY, EventDetails),
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_reminder_event_time_task():
+    from crewai import Task
+    return Task(
+        description=f"""
+  You will receive a question describing an event (such as a meeting or appointment).
+  Extract only its start datetime and end datetime (ISO format) and the timezone.
 
   Notes:
-  - The current date and time is {current_date}.
-  - Timezone: ALWAYS use {local_tz}
+  - Use the current date and time given below.
+  - Timezone: ALWAYS use the timezone given below.
   - You MUST extract the weekday or date and time of the event.
   - You MUST recognize common misspellings like "tommorrow" as "tomorrow".
   - You MUST extract time ranges (e.g. "9 AM to 11 AM") and calculate both start and end.
   - You MUST call the NextWeekdayDateTool if a weekday is provided.
- 
   - If only relative dates (like "tomorrow", "next week Monday", "coming Friday") are given, compute actual date directly.
+  - If no end time is given, end one hour after the start.
   - Do not hardcode any example dates.
-  - If no location is mentioned, use "Not specified".
 
+  Inputs:
+  - timezone: {LOCAL_TZ}
+  - current date and time: {{current_date}}
+  - question: {{question}}
     """,
-    input_keys=["sender", "question", "current_date", "local_tz"],
-    expected_output="A confirmation message with the created event details: subject, start (12-hour format with timezone), end (12-hour format with timezone), location, attendees.",
-    agent=reminder_event_agent
-)
-
-categorizer_agent = Agent(
-    role="Email Intent Categorizer",
-    goal="Classify the email or user request into appropriate handling categories.",
-    backstory="Trained to discern if an email needs a reply, contains a task, is a schedule request, or is informational.", 
-    memory=False, verbose=False,
-    llm_config={"model": "gpt-4", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-categorize_task = Task(
-    description=(
-    """
-description: >
-  You will receive two inputs:
-  - {content}: the actual message body
-  - {type}: the type of request, one of ["incoming_email", "user_request"]
-
-  Your job is to classify the message into one of the following categories:
-
-  - 'requires_response': Use this if:
-    • The message asks the AGENT to do something (e.g., write/send/summarize)
-    • OR the message is a casual greeting or general conversation ("Hi", "Hello there", "How are you?", etc.) and the type is 'user_request'
-
-  - 'actionable_task': Use this if:
-    • The type is 'incoming_email'
-    • AND the message expects the USER (not the agent) to take action (e.g., "Can you attend...", "Please register", "You need to finalize...")
-
-  - 'schedule_event': Use this if the message is about planning or confirming a meeting or calendar event.
-
-  - 'reminder': Use this if the user is asking the agent to create a reminder or store a todo/calendar task (e.g., "Remind me to...", "Add a task to...")
-
-  - 'no_action': Use this **only** if:
-    • The type is 'incoming_email'
-    • AND the content is FYI only, purely informational, or clearly not requiring any reply or action
-
-  - 'spam': For promotional, irrelevant, or junk content.
-
-IMPORTANT RULES:
-- Do NOT classify as 'no_action' for user_request type — only incoming_email.
-- If content says "Hi", "Hello", "How are you", etc. AND type is 'user_request' → classify as 'requires_response'.
-- Only use 'actionable_task' for **incoming_email** when sender expects the human user to act.
-- Only use 'requires_response' when agent is expected to act OR it's casual social user request.
-
-Examples:
-- "Hello there" + type=user_request → requires_response
-- "How are you?" + type=user_request → requires_response
-- "Hi" + type=user_request → requires_response
-- "FYI we updated the database" + type=incoming_email → no_action
-- "Please register for this event" + type=incoming_email → actionable_task
-- "Send an email to John" + type=user_request → requires_response
-- "Remind me to follow up tomorrow" + type=user_request → reminder
-- "Buy now!" + type=incoming_email→ spam
-
-Your final answer MUST be one of:
-'requires_response', 'actionable_task', 'schedule_event', 'reminder', 'no_action', 'spam'
-    """
-    ),
-    expected_output="One of: requires_response, actionable_task, schedule_event, reminder, no_action, spam",
-    agent=categorizer_agent,
-    input_keys=["content", "type"],
-    output_keys=["category"]
-)
+        input_keys=["question", "current_date"],
+        expected_output="start_datetime, end_datetime and timezone.",
+        output_pydantic=EventTime,
+        agent=get_reminder_event_time_agent()
+    )
+
+@lru_cache(maxsize=None)
+def get_reminder_event_details_task():
+    from crewai import Task
+    return Task(
+        description="""
+  You will receive a question describing an event (such as a meeting or appointment) and the sender's email.
+  Extract only:
+  - subject: the name or title of the event
+  - location: where the event takes place; use "Not specified" if no location is mentioned
+  - attendees: email addresses of the attendees mentioned in the question (not the sender)
+
+  Inputs:
+  - sender: {sender}
+  - question: {question}
+    """,
+        input_keys=["sender", "question"],
+        expected_output="subject, location and attendees.",
+        output_pydantic=EventDetails,
+        agent=get_reminder_event_details_agent()
+    )
+
+# Static classification rules for the categorizer. They live in the agent's
+# system block (cached prefix); the task itself only carries the message.
+# Kept in a file so the prefix is byte-identical on every call, which lets a
+# self-hosted server reuse a precomputed prompt cache (llama.cpp --prompt-cache).
+CATEGORIZER_RULES = load_prompt("categorizer_system.txt")
+
+# The routing classifiers (categorizer, triage, intent, reminder type) are
+# single-shot, tool-less calls, so they go straight to the model through
+# direct_completion instead of a one-agent crew.
+CATEGORIZE_PROMPT = LABEL_ONLY + "\ntype: {type}\ncontent: {content}"
+
+
+def categorize_direct(content: str, request_type: str) -> str:
+    """Categorizer label for content, e.g. 'requires_response'."""
+    answer = direct_completion(CATEGORIZER_RULES, CATEGORIZE_PROMPT.format(type=request_type, content=content), LLM_LABEL)
+    return _label(answer)
+
+# Backlog sweeps categorize many messages per call. The agent keeps the
+# categorizer's rules and cached prefix; only the answer format differs.
+@lru_cache(maxsize=None)
+def get_bulk_categorizer_agent():
+    return make_cached_agent(
+        role="Email Intent Categorizer",
+        goal="Classify each of a numbered list of emails or user requests into its handling category.",
+        backstory=CATEGORIZER_RULES,
+        memory=False, verbose=False,
+        llm_config=json_output_config(LLM_CLASSIFY, BulkCategories),
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_bulk_categorize_task():
+    from crewai import Task
+    return Task(
+        description=(
+            "Classify every numbered item below on its own, using the rules above. "
+            "Return JSON {\"labels\": [...]} with exactly {count} labels, the label of item 1 first.\n"
+            "type: {type}\n"
+            "items:\n{items}"
+        ),
+        expected_output='JSON: {"labels": ["<label of item 1>", "<label of item 2>", ...]}',
+        output_pydantic=BulkCategories,
+        agent=get_bulk_categorizer_agent(),
+        input_keys=["count", "type", "items"],
+    )
+
+# User requests are categorized and intent-routed in one call: the categorizer
+# rules plus the intent labels, answered as {"category", "intent"} JSON.
+TRIAGE_RULES = CATEGORIZER_RULES + "\n\n" + load_prompt("triage_intent.txt")
+
+LLM_TRIAGE = MappingProxyType({**json_output_config(LLM_CLASSIFY, Triage), "max_tokens": 40})
+
+
+def triage_direct(content: str) -> Triage:
+    """Category and intent of a user request in one schema-constrained call."""
+    return Triage.model_validate_json(direct_completion(TRIAGE_RULES, f"type: user_request\ncontent: {content}", LLM_TRIAGE))
 
 
 
@@ -865,76 +850,63 @@ Your final answer MUST be one of:
 # 4) Summarizer Agent and Task (for “no_action” emails)
 # ────────────────────────────────────────────────────────────────────────────────
 
-summarizer_agent = Agent(
-    role="Email Summarizer",
-    goal="Generate a concise 2–3 sentence summary of a non-actionable email, then insert it into the database.",
-    backstory=(
-        "You receive an email’s subject, body, sender, timestamp, mail_id, and userId. "
-        "First, produce a brief 2–3 sentence summary of that email’s main points. "
-        "Then call the `insert_email_record` tool (which inserts a row into the Emails table) "
-        "using exactly the structure: "
-        "{\"summary\": <your_summary>, \"id\": <mail_id>, \"userId\": <userId>, \"subject\": <subject>, \"sender\": <sender>, \"body_preview\": <body_preview>}. "
-        "Finally, output whatever confirmation string the tool returns."
-    ),
-    memory=False,
-    verbose=False,
-    tools=[insert_email_record],  # only this one tool is needed
-    llm_config={"model": "gpt-o4-mini", "temperature": 0.2},
-    allow_delegation=False,
-)
-
-# --- 2) Define a single Task that both summarises and then calls insert_email_record
-summarize_and_insert_task = Task(
-    description="""
-You are given a non-actionable email with the following details:
+# The summary is stored by crew.store_summary() straight from Python, so the
+# agent makes one LLM call and no insert_email_record tool turn.
+@lru_cache(maxsize=None)
+def get_summarizer_agent():
+    return make_cached_agent(
+        role="Email Summarizer",
+        goal="Generate a concise 2–3 sentence summary of a non-actionable email.",
+        backstory=(
+            "You receive an email’s subject, sender, timestamp and body preview, "
+            "and produce a brief 2–3 sentence summary of that email’s main points."
+        ),
+        memory=False,
+        verbose=False,
+        tools=[],  # no tools, pure summarization
+        llm_config=json_output_config(LLM_SUMMARY, EmailSummary),
+        allow_delegation=False,
+    )
+
+@lru_cache(maxsize=None)
+def get_summarize_email_task():
+    from crewai import Task
+    return Task(
+        description="""
+Summarize this non-actionable email into 2–3 sentences.
 
 Subject: {subject}
 Sender: {sender}
 Received DateTime: {receivedDateTime}
 Body Preview: {bodyPreview}
-
-
-Your task has 3 required steps:
-
-1. Carefully summarize this email into 2–3 sentences.
-
-2. Then call the tool `insert_email_record` using this exact structure:
-{
-  "summary": "<your summary>",
-  "id": "{id}",
-  "userId": {userId},
-  "subject": "{subject}",
-  "sender": "{sender}",
-  "body_preview": "{bodyPreview}"
-}
-
-3. The tool will return a confirmation string. You MUST return that confirmation string and Summary as your output. Do NOT return anything else.
 """,
-    input_keys=["subject", "body", "sender", "receivedDateTime", "bodyPreview", "id", "userId"],
-    expected_output="Confirmation string from insert_email_record tool",
-    agent=summarizer_agent
-)
+        input_keys=["subject", "sender", "receivedDateTime", "bodyPreview"],
+        expected_output="JSON with the 2–3 sentence summary",
+        output_pydantic=EmailSummary,
+        agent=get_summarizer_agent()
+    )
 
 #=============== Responder Router ================
 
-intent_router_agent = Agent(
-    role="Intent Router",
-    goal="Classify user input into one of three categories: 'general question', 'ask about email ability', 'write email', or 'send email'.",
-    backstory="You excel at understanding user intent. Your job is to classify whether the user is asking something general, asking about email capabilities, or wants to send an email.",
-    memory=False,
-    verbose=False,
-    llm_config={"model": "gpt-4o-mini", "temperature": 0.2},
-    allow_delegation=False,
+INTENT_RULES = (
+    "You excel at understanding user intent. Classify the message as one of:\n"
+    "- 'general': for unrelated casual questions.\n"
+    "- 'can you send email': if user is asking about capabilities.\n"
+    "- 'write email': if user wants the system to draft an email.\n"
+    + LABEL_ONLY
 )
 
-intent_task = Task(
-    description=(
-        "Classify the message as one of:\n"
-        "- 'general': for unrelated casual questions.\n"
-        "- 'can you send email': if user is asking about capabilities.\n"
-        "- 'write email': if user wants the system to draft an email.\n"
-        "Message: {question}"
-    ),
-    expected_output="general|can you send email|write email|send email",
-    agent=intent_router_agent,
-)
\ No newline at end of file
+
+def classify_intent_direct(question: str) -> str:
+    """Intent label of a user request: general, can you send email or write email."""
+    return _label(direct_completion(INTENT_RULES, f"Message: {question}", LLM_LABEL))
+
+def __getattr__(name: str):
+    """
+    PEP 562 hook: keep `from agents.email_agents import agent_manager` working
+    by building the agent/task through its cached get_<name>() factory on first access.
+    """
+    factory = globals().get(f"get_{name}")
+    if factory is None or not hasattr(factory, "cache_info"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return factory()
@@ -0,0 +1,82 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class DraftedEmail(BaseModel):
+    """Structured output of compose_email_task: the drafted email plus its self-review."""
+    receiver: str = Field(description="Recipient email address, or the recipient's name if no address was given")
+    subject: str
+    content: str = Field(description="Email body, ending with the sender's signature")
+    sender: str
+    attachments: List[str] = Field(default_factory=list)
+    passes_review: bool = Field(description="True when the draft meets the structure, tone and completeness checks")
+    review_notes: str = ""
+
+
+class EmailFields(BaseModel):
+    """Structured output of extract_email_sender_fields_task."""
+    sender: str
+    receiver: str
+    subject: str
+    body: str
+
+
+class AnalyzedEmail(BaseModel):
+    """Structured output of analyze_email_task."""
+    summary: str = Field(description="Numbered list of human-actionable tasks as a single string, or 'No human action is required.'")
+    id: str = Field(description="The mail_id passed in, unchanged")
+    userId: Optional[int] = Field(default=None, description="The userId passed in, unchanged; never inferred")
+
+
+Category = Literal["requires_response", "actionable_task", "schedule_event", "reminder", "no_action", "spam"]
+
+
+class Triage(BaseModel):
+    """Structured output of triage_task: category and, for requires_response, the intent."""
+    category: Category
+    intent: Optional[Literal["general", "can you send email", "write email"]] = Field(
+        default=None, description="Only set when category is requires_response"
+    )
+
+
+class BulkCategories(BaseModel):
+    """Structured output of bulk_categorize_task: one label per numbered item, in order."""
+    labels: List[Category]
+
+
+class TaskRecord(BaseModel):
+    title: str
+    detail: str = ""
+    due_at: Optional[str] = Field(default=None, description="ISO 8601 due date, if available")
+
+
+class TaskRecords(BaseModel):
+    """Structured output of create_task_records_task: the tasks that were created."""
+    tasks: List[TaskRecord] = Field(default_factory=list)
+
+
+class EmailSummary(BaseModel):
+    """Structured output of summarize_email_task; crew.store_summary() writes it to the Emails table."""
+    summary: str = Field(description="2–3 sentence summary of the email")
+
+
+class TodoReminder(BaseModel):
+    """Structured output of reminder_todo_task: the created To Do task."""
+    task_title: str
+    task_body: str = ""
+    due_date_time: str = Field(description="ISO 8601 due date in UTC")
+    confirmation: str = Field(description="Confirmation string returned by the create_todo_task tool")
+
+
+class EventTime(BaseModel):
+    """Structured output of reminder_event_time_task."""
+    start_datetime: str = Field(description="ISO 8601 start date and time")
+    end_datetime: str = Field(description="ISO 8601 end date and time")
+    timezone: str
+
+
+class EventDetails(BaseModel):
+    """Structured output of reminder_event_details_task."""
+    subject: str
+    location: str = "Not specified"
+    attendees: List[str] = Field(default_factory=list)
@@ -1,6 +1,12 @@
+import os
+import re
 import logging
-from crewai import Agent, Task, Crew, Process
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from agents.email_agents import *
+from agents.batch_runner import batch_kickoff
 import json
 import datetime
 from fastapi import Body
@@ -8,170 +14,574 @@ from fastapi.responses import JSONResponse
 from fastapi import HTTPException
 from fastapi import Request
 from db_utils import insert_record
-current_utc_date = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
-from tzlocal import get_localzone_name
-
-local_tz = get_localzone_name() 
+from tools.semantic_cache import SemanticCache
+from tools.fast_categorizer import fast_categorize, is_greeting
+from tools.reminder_classifier import classify_reminder
+from tools.email_dedup import EmailDeduplicator
+from tools.conversation_memory import ConversationMemory
+from tools.email_prefilter import should_skip
+from tools.format_email import format_email
+from tools.format_reminder import format_event_preview, format_todo_preview
+from tools.draft_validator import validate_draft
+from tools.llm_cache import install_llm_cache
+from tools.llm_http import install_llm_http_client
 # Logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+install_llm_cache()
+install_llm_http_client()
 
-email_attachment_crew = Crew(
-    agents=[
-        email_drafting_agent,
-        receiver_email_lookup_agent,
-        email_review_agent,
-        email_data_extractor_agent,
-        
-    ],
-    tasks=[
-        process_email_task,
-        lookup_receiver_email_task,
-        review_email_task,
-        extract_email_fields_task
-    ],
-    manager_agent=intent_router_agent,
-    process=Process.sequential,
-    verbose=True,
-)
 
+@lru_cache(maxsize=2)
+def _format_utc_minute(minute: int) -> str:
+    return datetime.datetime.fromtimestamp(minute * 60, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
 
-#================= Unified Crews =================
 
-categorizer_crew = Crew(
-    agents=[
-        categorizer_agent,
-        ],
-    tasks=[
-        categorize_task
-    ],
-    process=Process.sequential,
-    verbose=True
-)
+def current_utc_date() -> str:
+    """
+    The request-time UTC date for date-aware tasks, to the minute. Computed per
+    call (not at import) and passed as a task input placed after the static
+    instructions, so it never changes the cached prompt prefix. Requests in the
+    same minute share one formatted string.
+    """
+    return _format_utc_minute(int(time.time() // 60))
 
 
-intent_router_crew = Crew(
-    agents=[intent_router_agent],
-    tasks=[intent_task],
-    process=Process.sequential,
-    verbose=True
-)
+def kickoff_crew(get_crew, inputs: dict):
+    """
+    Kick off a private copy of the crew returned by get_crew. The cached crews
+    are templates: a Crew keeps per-run state (task outputs, usage metrics,
+    the interpolated prompts) on itself, so concurrent requests must never
+    kick off the same instance. Copying reuses the already built agents'
+    configuration and is far cheaper than building the crew again.
+    """
+    return get_crew().copy().kickoff(inputs=inputs)
 
-email_reponder_crew = Crew(
-    agents=[
-        email_drafting_agent,
-        receiver_email_lookup_agent,
-        email_review_agent,
-        email_data_extractor_agent,
-        email_format_agent,
-    
-        ],
-    tasks=[
-        process_email_task,
-        lookup_receiver_email_task,
-        review_email_task,
-        extract_email_fields_task,
-        email_format_task,
-        
-    ],
-    process=Process.sequential,
-    verbose=True
-)
 
-email_task_execution_crew = Crew(
-    agents=[       
-        auto_draft_reply_agent, 
-        summarizer_agent,
-        human_action_agent,
-        task_manager_agent
+@lru_cache(maxsize=None)
+def get_email_attachment_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[
+            get_composite_drafting_agent(),
+            get_receiver_email_lookup_agent(),
+        
         ],
-    tasks=[
-        auto_email_draft_reply_task,
-        summarize_and_insert_task,
-        analyze_email_task,
-        create_task_records_task
+        tasks=[
+            get_compose_email_task(),
+            get_lookup_receiver_email_task(),
         ],
-    process=Process.sequential,
-    verbose=True
-)
+        process=Process.sequential,
+        verbose=VERBOSE,
+    )
 
-no_action_crew = Crew(
-    agents=[summarizer_agent],
-    tasks=[summarize_and_insert_task],
-    process=Process.sequential,
-    verbose=True
-)
 
-casual_crew = Crew(
-    agents=[email_support_conversation_agent],
-    tasks=[email_conversation_task],
-    process=Process.sequential,
-    verbose=False
-)
+#================= Unified Crews =================
 
+@lru_cache(maxsize=None)
+def get_bulk_categorizer_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_bulk_categorizer_agent()],
+        tasks=[get_bulk_categorize_task()],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
 
-email_onboard_crew = Crew(
-    agents=[
-        email_sender_data_extractor_agent
-       
-        ],
-    tasks=[
-        extract_email_sender_fields_task    
-    ],
-    process=Process.sequential,
-    verbose=True
-)
 
+# Drafting, review and field extraction happen in one structured-output call
+@lru_cache(maxsize=None)
+def get_email_reponder_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_composite_drafting_agent()],
+        tasks=[get_compose_email_task()],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+
+# An actionable email gets a draft reply, a stored summary and its tasks. Only
+# task creation depends on another step (the analysis), so the work is split
+# into three crews that run concurrently; see execute_email_tasks().
+@lru_cache(maxsize=None)
+def get_auto_draft_reply_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_auto_draft_reply_agent()],
+        tasks=[get_auto_email_draft_reply_task()],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+
+@lru_cache(maxsize=None)
+def get_email_analysis_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[
+            get_human_action_agent(),
+            get_task_manager_agent()
+            ],
+        tasks=[
+            get_analyze_email_task(),
+            get_create_task_records_task()
+            ],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+
+@lru_cache(maxsize=None)
+def get_no_action_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_summarizer_agent()],
+        tasks=[get_summarize_email_task()],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+
+@lru_cache(maxsize=None)
+def get_casual_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_email_support_conversation_agent()],
+        tasks=[get_email_conversation_task()],
+        process=Process.sequential,
+        verbose=False
+    )
 
-email_sender_crew = Crew(
-    agents=[
-        email_sender_data_extractor_agent
+
+@lru_cache(maxsize=None)
+def get_email_onboard_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[
+            get_email_sender_data_extractor_agent()
        
+            ],
+        tasks=[
+            get_extract_email_sender_fields_task()    
         ],
-    tasks=[
-        extract_email_sender_fields_task    
-    ],
-    process=Process.sequential,
-    verbose=True
-)
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
 
 
-email_draft_reply_crew = Crew(
-    agents=[
-        draft_reply_agent
+@lru_cache(maxsize=None)
+def get_email_draft_reply_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[
+            get_draft_reply_agent()
+            ],
+        tasks=[
+            get_generate_email_reply_task()    
         ],
-    tasks=[
-        generate_email_reply_task    
-    ],
-    process=Process.sequential,
-    verbose=True
-)
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
 
 #_____________________________________________
 #           Reminder Crews
 #_____________________________________________
 
-reminder_todo_crew = Crew(
-    agents=[reminder_todo_formatter_preview_agent, reminder_todo_agent],
-    tasks=[reminder_todo_formatter_preview_task, reminder_todo_task],
-    process=Process.sequential
-)
-reminder_event_crew = Crew(
-    agents=[event_formatter_preview_agent, reminder_event_agent ],
-    tasks=[event_formatter_preview_task, reminder_event_task],
-    process=Process.sequential,
-    verbose=True
-)
+@lru_cache(maxsize=None)
+def get_reminder_todo_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_reminder_todo_agent()],
+        tasks=[get_reminder_todo_task()],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+@lru_cache(maxsize=None)
+def get_reminder_event_time_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_reminder_event_time_agent()],
+        tasks=[get_reminder_event_time_task()],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+
+@lru_cache(maxsize=None)
+def get_reminder_event_details_crew():
+    from crewai import Crew, Process
+    return Crew(
+        agents=[get_reminder_event_details_agent()],
+        tasks=[get_reminder_event_details_task()],
+        process=Process.sequential,
+        verbose=VERBOSE
+    )
+
+# Time and details extraction for an event are independent LLM calls.
+event_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="event")
+
+
+def create_event(event_payload: dict) -> str:
+    """
+    Extract the event's time and its details concurrently, create it with
+    CreateCalendarEventTool and return the rendered preview plus confirmation.
+    event_payload carries sender, question and current_date.
+    """
+    from tools.create_calendar_event_tool import create_calendar_event_tool
+    time_future = event_executor.submit(kickoff_crew, get_reminder_event_time_crew, event_payload)
+    details_future = event_executor.submit(kickoff_crew, get_reminder_event_details_crew, event_payload)
+    event = {**time_future.result().pydantic.model_dump(), **details_future.result().pydantic.model_dump()}
+
+    confirmation = create_calendar_event_tool.run(
+        sender_email=event_payload["sender"],
+        subject=event["subject"],
+        body="",
+        start_datetime=event["start_datetime"],
+        end_datetime=event["end_datetime"],
+        time_zone=event["timezone"],
+        location=event["location"],
+        attendees=", ".join(event["attendees"]),
+    )
+    return f"{format_event_preview(event)}\n\n{confirmation}"
+
+def reminder_answer(result, render) -> str:
+    """Preview rendered from the reminder crew's structured output, followed by the tool's confirmation."""
+    record = getattr(result, "pydantic", None)
+    if record is None:
+        return getattr(result, "raw", str(result))
+    return f"{render(record.model_dump())}\n\n{record.confirmation}"
+
 
-reminder_crew = Crew(
-    agents=[reminder_agent],
-    tasks=[reminder_task],
-    process=Process.sequential,
-    verbose=True
+
+# Crews on the request path. Building them imports CrewAI and the tools and
+# assembles every agent's system prompt, so it is done once at startup rather
+# than on the first request that needs each crew.
+REQUEST_PATH_CREWS = (
+    get_casual_crew,
+    get_email_reponder_crew,
+    get_email_onboard_crew,
+    get_email_draft_reply_crew,
+    get_auto_draft_reply_crew,
+    get_email_analysis_crew,
+    get_no_action_crew,
+    get_reminder_todo_crew,
+    get_reminder_event_time_crew,
+    get_reminder_event_details_crew,
 )
 
 
+def warm_crews() -> None:
+    for get_crew in REQUEST_PATH_CREWS:
+        get_crew()
+    logger.info(f"[Orchestrator] Built {len(REQUEST_PATH_CREWS)} crews")
+
+
+#_____________________________________________
+#           Classifier Caches
+#_____________________________________________
+
+CATEGORIES = {"requires_response", "actionable_task", "schedule_event", "reminder", "no_action", "spam"}
+INTENTS = {"general", "can you send email", "write email", "send email"}
+
+# The category depends on the request type, so each type gets its own namespace.
+categorize_caches = {
+    "incoming_email": SemanticCache("categorize:incoming_email"),
+    "user_request": SemanticCache("categorize:user_request"),
+}
+intent_cache = SemanticCache("intent")
+# Triage labels are "category" or "category|intent".
+triage_cache = SemanticCache("triage")
+
+
+_REPLY_PREFIX_RE = re.compile(r"^\s*((re|fwd?)\s*:\s*)+", re.I)
+
+
+def incoming_email_cache_key(sender: str, subject: str, preview: str) -> str:
+    """
+    Cache key for routing an incoming email: sender domain, subject without
+    Re:/Fwd: prefixes, and the first 512 characters of the preview, so
+    replies and repeat mailings from the same source share a decision.
+    """
+    domain = (sender or "").strip().strip("<>").lower().rpartition("@")[2]
+    subject = _REPLY_PREFIX_RE.sub("", subject or "").strip().lower()
+    return f"{domain}|{subject}|{(preview or '')[:512]}"
+
+
+# Classifiers only see the head of a message: the category is settled by the
+# opening lines, and long bodies (quoted threads, footers) only add prefill.
+CLASSIFY_CHARS = 1500
+
+
+def _trim(text: str, limit: int = CLASSIFY_CHARS) -> str:
+    return (text or "")[:limit]
+
+
+def categorize(content: str, request_type: str, cache_key: str = None) -> str:
+    """
+    Classify content: deterministic keyword rules first, then the categorizer model call
+    (served from the semantic cache when possible, looked up by cache_key or
+    the content itself). Only the first CLASSIFY_CHARS characters are used.
+    """
+    content = _trim(content)
+    category = fast_categorize(content, request_type)
+    if category is not None:
+        return category
+
+    run = lambda: categorize_direct(content, request_type)
+    cache = categorize_caches.get(request_type)
+    if cache is None:
+        return run()
+    return cache.get_or_call(cache_key or content, run, accept=lambda label: label in CATEGORIES)
+
+
+# Backlog categorization packs this many messages into one categorizer call;
+# each message is cut to BULK_ITEM_CHARS so one long email cannot crowd the rest.
+BULK_CATEGORIZE_SIZE = int(os.getenv("BULK_CATEGORIZE_SIZE", "20"))
+BULK_ITEM_CHARS = 1000
+
+
+def _bulk_labels(request_type: str, contents: list):
+    """Labels for one chunk from bulk_categorizer_crew, or None if the answer is unusable."""
+    items = "\n".join(f"{n}. {' '.join((content or '').split())[:BULK_ITEM_CHARS]}" for n, content in enumerate(contents, 1))
+    try:
+        result = kickoff_crew(
+            get_bulk_categorizer_crew, {"count": len(contents), "type": request_type, "items": items}
+        )
+        labels = [label.strip().lower() for label in result.pydantic.labels]
+    except Exception:
+        logger.warning("[Orchestrator] Bulk categorization failed", exc_info=True)
+        return None
+    if len(labels) != len(contents) or any(label not in CATEGORIES for label in labels):
+        logger.warning(f"[Orchestrator] Bulk categorization returned {len(labels)} labels for {len(contents)} items")
+        return None
+    return labels
+
+
+def bulk_categorize(messages: list) -> list:
+    """
+    Categorize a backlog (mailbox onboarding, replays) in as few LLM calls as possible.
+
+    messages are dicts with "content", "type" and an optional "cache_key"
+    (see incoming_email_cache_key). Keyword rules and the categorize caches
+    answer first; the remaining messages are sorted by length and sent
+    BULK_CATEGORIZE_SIZE per call. A chunk whose answer does not line up with
+    its items falls back to categorize() per message. Labels come back in input order.
+    """
+    labels = [fast_categorize(message.get("content", ""), message.get("type")) for message in messages]
+    pending = {}
+    for index, message in enumerate(messages):
+        if labels[index] is None:
+            pending.setdefault(message.get("type"), []).append(index)
+
+    for request_type, indexes in pending.items():
+        cache = categorize_caches.get(request_type)
+        keys = {i: messages[i].get("cache_key") or messages[i].get("content", "") for i in indexes}
+        if cache is not None:
+            for i, label in zip(indexes, cache.get_many([keys[i] for i in indexes])):
+                labels[i] = label
+
+        misses = sorted((i for i in indexes if labels[i] is None), key=lambda i: len(messages[i].get("content") or ""))
+        logger.info(f"[Orchestrator] Bulk categorizing {len(misses)} of {len(indexes)} {request_type} messages")
+        for start in range(0, len(misses), BULK_CATEGORIZE_SIZE):
+            chunk = misses[start:start + BULK_CATEGORIZE_SIZE]
+            chunk_labels = _bulk_labels(request_type, [messages[i].get("content", "") for i in chunk])
+            if chunk_labels is None:
+                chunk_labels = [categorize(messages[i].get("content", ""), request_type, messages[i].get("cache_key")) for i in chunk]
+            elif cache is not None:
+                for i, label in zip(chunk, chunk_labels):
+                    cache.set(keys[i], label)
+            for i, label in zip(chunk, chunk_labels):
+                labels[i] = label
+    return labels
+
+
+def classify_intent(input_payload: dict) -> str:
+    """Classify the user's intent with one direct model call, cached on the question text."""
+    run = lambda: classify_intent_direct(input_payload.get("question", ""))
+    return intent_cache.get_or_call(input_payload.get("question", ""), run, accept=lambda label: label in INTENTS)
+
+
+def _triage_label(triage) -> str:
+    return f"{triage.category}|{triage.intent}" if triage.intent else triage.category
+
+
+def _valid_triage_label(label: str) -> bool:
+    category, _, intent = label.partition("|")
+    if category == "requires_response":
+        return intent in INTENTS
+    return category in CATEGORIES and not intent
+
+
+def triage(input_payload: dict):
+    """
+    Category and intent (None unless the category is requires_response) of a
+    user request, from one triage model call instead of separate category and
+    intent calls. Keyword rules still short-circuit the category.
+    """
+    question = _trim(input_payload.get("question", ""))
+    category = fast_categorize(question, "user_request")
+    if category is not None:
+        if category != "requires_response":
+            return category, None
+        # A bare greeting is small talk; no need to ask the intent router
+        return category, "general" if is_greeting(question) else classify_intent(input_payload)
+
+    run = lambda: _triage_label(triage_direct(question))
+    category, _, intent = triage_cache.get_or_call(question, run, accept=_valid_triage_label).partition("|")
+    return category, intent or None
+
+
+def classify_reminder_type(question: str, sender: str) -> str:
+    """'todo' or 'event': keyword/centroid rules first, a direct model call only when they are unsure."""
+    reminder_type = classify_reminder(question)
+    if reminder_type is not None:
+        return reminder_type
+    return classify_reminder_direct(question)
+
+
+# Chat history for casual_crew: a few clipped turns per conversation instead
+# of CrewAI memory, so the context per call stays bounded.
+conversation_memory = ConversationMemory()
+
+
+def casual_reply(input_payload: dict) -> str:
+    """Answer a casual chat message with casual_crew, given the recent turns of its conversation."""
+    conversation_id = input_payload.get("conversation_id")
+    result = kickoff_crew(
+        get_casual_crew, {**input_payload, "history": conversation_memory.history(conversation_id)}
+    )
+    answer = getattr(result, "output", str(result))
+    conversation_memory.remember(conversation_id, input_payload.get("question"), answer)
+    return answer
+
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+
+
+# Draft steps fan out on a small pool: the sender-profile fetch and a
+# speculative contact lookup run side by side, ahead of the LLM draft.
+DRAFT_STEP_TIMEOUT = float(os.getenv("DRAFT_STEP_TIMEOUT", "15"))
+draft_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="draft")
+
+_RECIPIENT_HINT_RE = re.compile(r"\b(?:to|email|mail|message)\s+([A-Z][\w'-]+(?:\s+[A-Z][\w'-]+)?)")
+
+
+def _recipient_hint(question: str):
+    """Best-effort recipient name from the instruction, used to start the contact lookup early."""
+    if EMAIL_RE.search(question or ""):
+        return None
+    match = _RECIPIENT_HINT_RE.search(question or "")
+    return match.group(1) if match else None
+
+
+def _fetch_sender_profile(sender_email: str) -> str:
+    from tools.getprofile_tool import get_user_profile_by_email
+    try:
+        return get_user_profile_by_email.run(email=sender_email)
+    except Exception:
+        logger.warning(f"[Orchestrator] Could not fetch profile for {sender_email}", exc_info=True)
+        return "Profile unavailable."
+
+
+def _lookup_contact(sender_email: str, contact_name: str):
+    from tools.get_receiver_email_tool import get_contact_email_by_name
+    try:
+        return get_contact_email_by_name.run(sender=sender_email, contact_name=contact_name)
+    except Exception:
+        logger.warning(f"[Orchestrator] Contact lookup failed for '{contact_name}'", exc_info=True)
+        return None
+
+
+def _result(future, default=None):
+    try:
+        return future.result(timeout=DRAFT_STEP_TIMEOUT)
+    except Exception:
+        logger.warning("[Orchestrator] Draft step timed out or failed", exc_info=True)
+        return default
+
+
+def _compose(question: str, sender_email: str, sender_profile: str):
+    result = kickoff_crew(
+        get_email_reponder_crew, {"question": question, "sender_email": sender_email, "sender_profile": sender_profile}
+    )
+    draft = result.pydantic
+    if not draft.passes_review:
+        logger.warning(f"[Orchestrator] Draft did not pass review: {draft.review_notes}")
+    return draft
+
+
+def draft_email(question: str, sender_email: str) -> str:
+    """
+    Draft, self-review and format an email for the user's instruction.
+
+    The sender profile is fetched directly (no LLM tool-call turn) while a
+    contact lookup for the recipient named in the instruction runs in
+    parallel. The lookup result is only used when the draft's receiver
+    is that same name; otherwise the receiver is looked up after drafting.
+    """
+    hint = _recipient_hint(question)
+    profile_future = draft_executor.submit(_fetch_sender_profile, sender_email)
+    lookup_future = draft_executor.submit(_lookup_contact, sender_email, hint) if hint else None
+
+    sender_profile = _result(profile_future, "Profile unavailable.")
+    draft = _compose(question, sender_email, sender_profile)
+
+    receiver = draft.receiver.strip()
+    if not EMAIL_RE.fullmatch(receiver):
+        address = None
+        if lookup_future is not None and hint.lower() == receiver.lower():
+            address = _result(lookup_future)
+        if not address:
+            address = _lookup_contact(sender_email, receiver)
+        if address:
+            draft.receiver = address
+        else:
+            logger.warning(f"[Orchestrator] No email address found for receiver '{receiver}'")
+
+    # Structural review is deterministic; the LLM only redrafts when it finds fixable problems.
+    _, problems = validate_draft(draft.model_dump())
+    fixable = [problem for problem in problems if not problem.startswith("receiver")]
+    if fixable:
+        logger.info(f"[Orchestrator] Redrafting email, structural problems: {fixable}")
+        feedback = question + "\n\nThe previous draft had these problems, fix them:\n- " + "\n- ".join(fixable)
+        redraft = _compose(feedback, sender_email, sender_profile)
+        redraft.receiver = draft.receiver
+        draft = redraft
+
+    return format_email(draft.receiver, draft.subject, draft.content)
+
+
+# Exact + near-duplicate detection for incoming mail (newsletters, notification floods)
+email_deduplicator = EmailDeduplicator()
+
+# Incoming-email webhooks run on their own bounded pool, so a burst of mail is
+# processed concurrently without taking every server thread from user requests.
+INCOMING_EMAIL_WORKERS = int(os.getenv("INCOMING_EMAIL_WORKERS", "16"))
+incoming_email_executor = ThreadPoolExecutor(max_workers=INCOMING_EMAIL_WORKERS, thread_name_prefix="incoming-email")
+
+# Webhook retries and duplicate deliveries of a mail_id that is still being
+# processed wait for the first run's result instead of starting another one.
+_inflight = {}  # mail_id -> Future
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key: str, fn, *args):
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        logger.info(f"[Orchestrator] Email {key} is already being processed; waiting for that run")
+        return future.result()
+    try:
+        result = fn(*args)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
 # ─── New: Manager Orchestrator ───────────────────────────────────────────────────
 def manager_orchestrator(inputs: dict):
     """
@@ -219,9 +629,29 @@ def manager_orchestrator(inputs: dict):
             "conversation_id": inputs.get("conversation_id", "")
         }
 
-        logger.info(f"[Orchestrator] Incoming email detected. Running email_task_pipeline with: {kickoff_payload}")
-        incoming_email_result = Email_Crew_Pipeline(kickoff_payload)
-        return {"status": "incoming_processed", "result": getattr(incoming_email_result, "output", str(incoming_email_result))}
+        if should_skip(
+            kickoff_payload["sender"],
+            kickoff_payload["subject"],
+            inputs.get("internetMessageHeaders"),
+            receiver=kickoff_payload["receiver"],
+        ):
+            logger.info(f"[Orchestrator] Email {inputs['id']} dropped by prefilter (automated/bulk sender, headers or subject)")
+            return {"status": "dropped", "result": "Dropped: Non-actionable"}
+
+        dedup_text = "\n".join([kickoff_payload["subject"], kickoff_payload["body"] or kickoff_payload["bodyPreview"]])
+        # Scoped to the receiving mailbox: the same mail sent to several users is processed for each
+        mailbox = f"{kickoff_payload['receiver']}|{kickoff_payload['userId']}"
+        original_id = email_deduplicator.lookup(mailbox, dedup_text)
+        if original_id is not None:
+            logger.info(f"[Orchestrator] Email {inputs['id']} duplicates {original_id}; skipping the agent pipeline")
+            return {"status": "duplicate", "duplicate_of": original_id}
+
+        logger.info("[Orchestrator] Incoming email %s detected. Running email_task_pipeline", inputs["id"])
+        logger.debug("[Orchestrator] email_task_pipeline payload: %s", kickoff_payload)
+        incoming_email_result = _single_flight(inputs["id"], Email_Crew_Pipeline, kickoff_payload)
+        result = getattr(incoming_email_result, "output", str(incoming_email_result))
+        email_deduplicator.remember(mailbox, inputs["id"], dedup_text)
+        return {"status": "incoming_processed", "result": result}
 
     # ─── 2) User “Ask” / “Send Email” Command ─────────────────────────────────────
     elif "question" in inputs:
@@ -239,7 +669,7 @@ def manager_orchestrator(inputs: dict):
             "sender": inputs.get("sender", ""),
             "conversation_id": inputs.get("conversation_id"),
             "attachments": inputs.get("attachments", None),
-            "current_date": current_utc_date,
+            "current_date": current_utc_date(),
             "subject": "",
             "body":""
         }
@@ -248,184 +678,387 @@ def manager_orchestrator(inputs: dict):
     else:
         raise ValueError("Manager Orchestrator received an unrecognized payload: neither 'id' nor 'question' present.")
 
+# Reply drafting needs the thread, the last inbound message and the user's
+# profile; all three are fetched in parallel before the LLM runs instead of
+# through three sequential tool-call turns.
+reply_context_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="reply-context")
+
+
+def _run_tool(tool, default: str, **kwargs) -> str:
+    try:
+        return tool.run(**kwargs)
+    except Exception:
+        logger.warning(f"[Orchestrator] {tool.name} failed", exc_info=True)
+        return default
+
+
+def prefetch_reply_context(mail_id: str, user_email: str) -> dict:
+    """Thread, last recipient message and profile for the reply tasks, keyed by their input names."""
+    from tools.fetch_email_thread_tools import fetch_email_thread_tool
+    from tools.get_last_recipient_message_tool import get_last_recipient_message_tool
+    thread_future = reply_context_executor.submit(
+        _run_tool, fetch_email_thread_tool, "Thread unavailable.", user_email=user_email, mail_id=mail_id
+    )
+    last_message_future = reply_context_executor.submit(
+        _run_tool, get_last_recipient_message_tool, "Last message unavailable.", user_email=user_email, mail_id=mail_id
+    )
+    profile_future = reply_context_executor.submit(_fetch_sender_profile, user_email)
+    return {
+        "thread": _result(thread_future, "Thread unavailable."),
+        "last_message": _result(last_message_future, "Last message unavailable."),
+        "profile": _result(profile_future, "Profile unavailable."),
+    }
+
+
+def task_execution_payload(input_payload: dict, reply_context: dict = None) -> dict:
+    """
+    Inputs for the actionable-email crews (draft reply, summary, analysis, task creation).
+    reply_context is the prefetch_reply_context() result when the caller already has it.
+    """
+    if reply_context is None:
+        reply_context = prefetch_reply_context(input_payload.get("id"), input_payload.get("receiver"))
+    return {
+        "id": input_payload.get("id"),
+        "receivedDateTime": input_payload.get("receivedDateTime"),
+        "subject": input_payload.get("subject"),
+        "bodyPreview": input_payload.get("bodyPreview"),
+        "sender": input_payload.get("sender"),
+        "receiver": input_payload.get("receiver"),
+        "userId": input_payload.get("userId"),
+        # Payload for draft reply
+        "mail_id": input_payload.get("id"),
+        "sender_email": input_payload.get("sender"),
+        **reply_context,
+    }
+
+
+# Chat turns are persisted off the request path: the answer goes back to the
+# caller while the messages are written to Postgres on this pool.
+record_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="record")
+
+
+def _log_record_failure(conversation_id, future: Future) -> None:
+    if future.exception() is not None:
+        logger.error(f"[Orchestrator] Failed to record turn for conversation {conversation_id}", exc_info=future.exception())
+
+
+def record_turn(conversation_id, question: str, answer: str) -> None:
+    """Queue insert_record for a finished chat turn without waiting for the database."""
+    future = record_executor.submit(insert_record, conversation_id, question, answer)
+    future.add_done_callback(lambda f: _log_record_failure(conversation_id, f))
+
+
+# The actionable-email crews of one pipeline run overlap on this pool instead
+# of running back to back.
+pipeline_executor = ThreadPoolExecutor(max_workers=3 * INCOMING_EMAIL_WORKERS, thread_name_prefix="pipeline")
+
+# Crews run for an actionable email; the analysis crew's output is the answer.
+ACTIONABLE_CREWS = (get_auto_draft_reply_crew, get_no_action_crew, get_email_analysis_crew)
+
+
+def store_summary(payload: dict, result) -> str:
+    """
+    Queue no_action_crew's summary for the Emails table and return the
+    {"summary", "confirmation"} JSON answer. Exceptions (failed batch rows)
+    are passed through unchanged.
+    """
+    if isinstance(result, Exception):
+        return result
+    from tools.insert_email_tool import insert_email_record
+    summary_record = getattr(result, "pydantic", None)
+    summary = summary_record.summary if summary_record is not None else getattr(result, "raw", str(result))
+    confirmation = insert_email_record.run(
+        summary=summary,
+        id=payload["id"],
+        userId=payload["userId"],
+        subject=payload["subject"],
+        sender=payload["sender"],
+        body_preview=payload["bodyPreview"],
+    )
+    return json.dumps({"summary": summary, "confirmation": confirmation})
+
+
+def summarize_email(payload: dict) -> str:
+    return store_summary(payload, kickoff_crew(get_no_action_crew, payload))
+
+
+def execute_email_tasks(create_task_payload: dict):
+    """
+    Draft the reply, store the summary and create the tasks of an actionable
+    email concurrently. Returns the analysis crew's result (the created tasks).
+    """
+    draft_future = pipeline_executor.submit(kickoff_crew, get_auto_draft_reply_crew, create_task_payload)
+    summary_future = pipeline_executor.submit(summarize_email, create_task_payload)
+    analysis_future = pipeline_executor.submit(kickoff_crew, get_email_analysis_crew, create_task_payload)
+    draft_future.result()
+    summary_future.result()
+    return analysis_future.result()
+
+
+# ─── Pipeline Branches ───────────────────────────────────────────────────────────
+# Each (category, type) pair routes to one handler; a handler builds only the
+# payload its own crew needs. All take (input_payload, intent, reply_context_future).
+
+def _handle_user_request(input_payload: dict, intent, reply_context_future):
+    logger.info(f"[Orchestrator] Intent classified as: {intent}")
+    question = input_payload.get("question")
+    if intent == "write email":
+        answer = draft_email(question, input_payload.get("sender"))
+        record_turn(input_payload.get("conversation_id"), question, answer)
+        return {"type": "email_written", "question": question, "answer": answer}
+
+    # "general", "can you send email" and anything unrecognized go to casual_crew
+    answer = casual_reply(input_payload)
+    record_turn(input_payload.get("conversation_id"), question, answer)
+    return {"type": "casual_reply", "question": question, "answer": answer}
+
+
+def _handle_reminder(input_payload: dict, intent, reply_context_future):
+    reminder_type = classify_reminder_type(input_payload.get("question"), input_payload.get("sender"))
+    if reminder_type == "event":
+        return _handle_event(input_payload, intent, reply_context_future)
+    if reminder_type != "todo":
+        return None
+    try:
+        todo_payload = {
+            "sender": input_payload.get("sender"),
+            "question": input_payload.get("question"),
+            "current_date": current_utc_date(),
+        }
+        result = kickoff_crew(get_reminder_todo_crew, todo_payload)
+        answer = reminder_answer(result, format_todo_preview)
+        record_turn(input_payload.get("conversation_id"), input_payload.get("question"), answer)
+        return JSONResponse(content={
+            "type": "reminder_created",
+            "question": input_payload.get("question"),
+            "answer": answer
+        })
+    except Exception as e:
+        logger.exception("Error in /todoTask endpoint:")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _handle_event(input_payload: dict, intent, reply_context_future):
+    try:
+        event_payload = {
+            "sender": input_payload.get("sender"),
+            "question": input_payload.get("question"),
+            "current_date": current_utc_date()
+        }
+        answer = create_event(event_payload)
+        record_turn(input_payload.get("conversation_id"), input_payload.get("question"), answer)
+        return JSONResponse(content={
+            "type": "event_created",
+            "question": input_payload.get("question"),
+            "answer": answer
+        })
+    except Exception as e:
+        logger.exception("Error in /event endpoint:")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _handle_actionable(input_payload: dict, intent, reply_context_future):
+    reply_context = reply_context_future.result() if reply_context_future else None
+    create_task_payload = task_execution_payload(input_payload, reply_context)
+
+    task_execution_result = execute_email_tasks(create_task_payload)
+
+    answer = getattr(task_execution_result, "raw", str(task_execution_result))  # JSON from the task's output schema
+    return {"type": "actionable_task", "answer": answer}
+
+
+def _handle_spam(input_payload: dict, intent, reply_context_future):
+    return {"type": "spam/irrelevant", "answer": "The message was skipped. It was not relevant to the user."}
+
+
+def _handle_no_action(input_payload: dict, intent, reply_context_future):
+    summary_payload = {
+        "id": input_payload["id"],
+        "receivedDateTime": input_payload["receivedDateTime"],  # must match 'timestamp'
+        "subject": input_payload["subject"],
+        "bodyPreview": input_payload["bodyPreview"],            # must match 'body'
+        "sender": input_payload["sender"],
+        "userId": input_payload["userId"]
+    }
+
+    answer = summarize_email(summary_payload)
+    return {"type": "no_action", "answer": answer}
+
+
+def _handle_unknown(input_payload: dict, intent, reply_context_future):
+    return {"type": "unknown_category", "answer": "The message was skipped. Unknown Category."}
+
+
+PIPELINE_HANDLERS = {
+    ("requires_response", "user_request"): _handle_user_request,
+    ("reminder", "user_request"): _handle_reminder,
+    ("schedule_event", "user_request"): _handle_event,
+    ("actionable_task", "incoming_email"): _handle_actionable,
+    # Meeting invites and scheduling requests in incoming mail become tasks
+    ("schedule_event", "incoming_email"): _handle_actionable,
+    ("spam", "incoming_email"): _handle_spam,
+    ("spam/irrelevant", "incoming_email"): _handle_spam,
+    ("no_action", "incoming_email"): _handle_no_action,
+}
+
+
 def Email_Crew_Pipeline(input_payload):
 
-    logger.info(f"[Orchestrator] Categorizing user command: {input_payload}")
+    logger.debug("[Orchestrator] Categorizing user command: %s", input_payload)
     
-    logger.info(f"[Orchestrator] Attachments: {input_payload.get('attachments', None)}")
+    logger.debug("[Orchestrator] Attachments: %s", input_payload.get("attachments"))
 
  
+    cache_key = None
     if input_payload.get("question", "").strip():
         content = input_payload["question"]
     elif input_payload.get("body", "").strip():
         content = input_payload["body"]
     else:
-        content = input_payload.get("body", "")
-    
-    categorizer_payload = {
-            "content": content,
-            "type": input_payload.get("type")
-        }
-    
-    logger.info(f"[Orchestrator] Categorizing user command: {content}")
+        # Webhook payloads often carry only the preview; never categorize (or cache) an empty body
+        content = input_payload.get("bodyPreview", "")
+
+    reply_context_future = None
+    if input_payload.get("type") == "incoming_email":
+        cache_key = incoming_email_cache_key(
+            input_payload.get("sender"), input_payload.get("subject"), input_payload.get("bodyPreview") or content
+        )
+        # When the keyword rules cannot settle the category, a model call follows;
+        # fetch the reply context (read-only Graph calls) while it runs, since an
+        # actionable email needs it next.
+        if fast_categorize(_trim(content), "incoming_email") is None:
+            reply_context_future = pipeline_executor.submit(
+                prefetch_reply_context, input_payload.get("id"), input_payload.get("receiver")
+            )
 
-    categorization_result = categorizer_crew.kickoff(inputs=categorizer_payload)
-    category = str(getattr(categorization_result, "output", categorization_result)).strip().lower()
+    logger.debug("[Orchestrator] Categorizing content: %s", content)
+
+    # User requests are categorized and intent-routed in a single triage call
+    intent = None
+    if input_payload.get("type") == "user_request" and input_payload.get("question", "").strip():
+        category, intent = triage(input_payload)
+    else:
+        category = categorize(content, input_payload.get("type"), cache_key=cache_key)
     logger.info(f"[Orchestrator] categorized as: {category}")
     logger.info(f"[Orchestrator] type: {input_payload.get('type')}")
 
-    conversation_id = input_payload.get("conversation_id")
-
-    if category == "requires_response" and input_payload.get("type") == "user_request":
-        classification_result = intent_router_crew.kickoff(inputs=input_payload)
-        intent = str(getattr(classification_result, "output", classification_result)).strip().lower()
-        logger.info(f"[Orchestrator] Intent classified as: {intent}")
+    handler = PIPELINE_HANDLERS.get((category, input_payload.get("type")), _handle_unknown)
+    return handler(input_payload, intent, reply_context_future)
 
-        # 2b) If intent == "general" or "can you send email" → delegate to casual_crew
-        if intent in ["general", "can you send email"]:
-            casual_result = casual_crew.kickoff(inputs=input_payload)
-            answer = getattr(casual_result, "output", str(casual_result))
-            insert_record(conversation_id, input_payload.get("question"), answer)
-            return {"type": "casual_reply", "question": input_payload.get("question"), "answer": answer}
 
-        elif intent == "write email":
-            draft_payload = {
-                "question": input_payload.get("question"),
-                "sender_email": input_payload.get("sender")
-            }
-            email_result = email_reponder_crew.kickoff(inputs=draft_payload)
-            answer = getattr(email_result, "output", str(email_result))
-            insert_record(conversation_id, input_payload.get("question"), answer)
-            return {"type": "email_written", "question": input_payload.get("question"), "answer": answer}
+# ─── Mailbox Sweeps ──────────────────────────────────────────────────────────────
+# Requests-per-minute budget for the summarizer model, shared across all workers.
+SUMMARIZER_RPM_LIMIT = int(os.getenv("SUMMARIZER_RPM_LIMIT", "500"))
 
 
-        # 2c) If intent == "send email" → use email_crew (draft, lookup, review, send)
-        # elif intent == "send email" :
+def run_mailbox_parallel(emails: list, max_workers: int = 10) -> list:
+    """
+    Summarize and store a batch of non-actionable emails concurrently.
 
-        #     send_payload = {
-        #         "question": input_payload.get("question"),
-        #         "sender_email": input_payload.get("sender")
-        #     }
+    Each worker kicks off its own copy of no_action_crew (CrewAI crews are not
+    safe to share between concurrent kickoffs), and the RPM budget is split
+    across workers so the pool as a whole stays within the model's rate limit.
+    Returns one result per email, in input order; failures are returned as
+    {"id", "error"} dicts instead of aborting the sweep.
+    """
+    summary_payloads = [
+        {
+            "id": email["id"],
+            "receivedDateTime": email.get("receivedDateTime", ""),
+            "subject": email.get("subject", ""),
+            "bodyPreview": email.get("bodyPreview", ""),
+            "sender": email.get("sender", ""),
+            "userId": email.get("userId"),
+        }
+        for email in emails
+    ]
+    logger.info(f"[Mailbox] Summarizing {len(emails)} emails")
+    results = batch_kickoff(get_no_action_crew(), summary_payloads, max_workers=max_workers,
+                            max_rpm=SUMMARIZER_RPM_LIMIT, return_exceptions=True)
+    results = [store_summary(payload, result) for payload, result in zip(summary_payloads, results)]
+    return [_mailbox_result(email, result) for email, result in zip(emails, results)]
 
-        #     logger.info(f"[Orchestrator] Sending email: {send_payload}")
-        #     send_result = email_onboard_crew.kickoff(inputs=send_payload)
-        #     raw_output = str(send_result)
 
-        #     # Strip triple backticks and markdown labeling if present
-        #     clean_output = raw_output.strip().removeprefix("
+def run_actionable_parallel(emails: list, max_workers: int = 8) -> list:
+    """
+    Run the actionable-email crews (draft reply, summary, analyze → create
+    tasks) for a batch of emails polled from a mailbox. Each crew is batched
+    with batch_kickoff and the three batches run side by side. Same result
+    shape as run_mailbox_parallel; a row fails if any of its crews failed.
+    """
+    logger.info(f"[Mailbox] Executing tasks for {len(emails)} actionable emails")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(emails)))) as pool:
+        payloads = list(pool.map(task_execution_payload, emails))
+    with ThreadPoolExecutor(max_workers=len(ACTIONABLE_CREWS)) as pool:
+        batches = list(pool.map(
+            lambda get_crew: batch_kickoff(get_crew(), payloads, max_workers=max_workers, return_exceptions=True),
+            ACTIONABLE_CREWS,
+        ))
+    summaries = ACTIONABLE_CREWS.index(get_no_action_crew)
+    batches[summaries] = [store_summary(payload, result) for payload, result in zip(payloads, batches[summaries])]
+    results = [next((r for r in row if isinstance(r, Exception)), row[-1]) for row in zip(*batches)]
+    return [_mailbox_result(email, result) for email, result in zip(emails, results)]
 
-        else:
-            # (Fallback: anything else we didn’t explicitly recognize → treat as “general”)
-            fallback_result = casual_crew.kickoff(inputs=input_payload)
-            answer = getattr(fallback_result, "output", str(fallback_result))
-            insert_record(conversation_id, input_payload.get("question"), answer)
-            return {"type": "casual_reply", "question": input_payload.get("question"), "answer": answer}
-
-    elif category == "actionable_task" and input_payload.get("type") == "incoming_email":
-        create_task_payload = {
-            "id": input_payload.get("id"), 
-            "receivedDateTime": input_payload.get("receivedDateTime"), 
-            "subject": input_payload.get("subject"), 
-            "bodyPreview": input_payload.get("bodyPreview"), 
-            "sender": input_payload.get("sender"), 
-            "receiver": input_payload.get("receiver"),
-            "userId": input_payload.get("userId"),
-            # Payload for draft reply
-            "mail_id": input_payload.get("id"),
-            "sender_email": input_payload.get("sender"),
 
-        }
+def manager_orchestrator_batch(inputs_list: list, max_workers: int = 8) -> list:
+    """
+    Run manager_orchestrator over a batch of incoming-email payloads concurrently
+    instead of one webhook at a time. Orchestrations are independent (each
+    borrows its own pooled DB connection and duplicate mail ids are
+    single-flighted), so the LLM and Graph waits overlap across threads.
+    Returns one result per payload, in input order; failures are returned as
+    {"id", "error"} dicts instead of aborting the batch.
+    """
+    if not inputs_list:
+        return []
 
-        task_execution_result = email_task_execution_crew.kickoff(inputs=create_task_payload)
+    def run(inputs: dict):
+        try:
+            return manager_orchestrator(inputs)
+        except Exception as e:
+            logger.exception(f"[Mailbox] Orchestration failed for email {inputs.get('id')}")
+            return {"id": inputs.get("id"), "error": str(e)}
 
-        answer = getattr(task_execution_result, "output", str(task_execution_result))
-        return {"type": "actionable_task","answer": answer}
+    logger.info(f"[Mailbox] Orchestrating {len(inputs_list)} emails")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(inputs_list))), thread_name_prefix="orchestrate") as pool:
+        return list(pool.map(run, inputs_list))
 
-    elif category == "spam/irrelevant" and input_payload.get("type") == "incoming_email":
-        return {"type": "spam/irrelevant","answer": "The message was skipped. It was not relevant to the user."}
 
-    elif category == "reminder" and input_payload.get("type") == "user_request":
-        reminder_payload = {
-            "question": input_payload.get("question"),
-            "sender": input_payload.get("sender"),
-        }
-        reminder_result = reminder_crew.kickoff(inputs=reminder_payload)
-        reminder_type = getattr(reminder_result, "output", str(reminder_result))
-        if reminder_type == "todo":
-            try:
-                # Prepare the payload for the crew
-                todo_payload = {
-                    "sender": input_payload.get("sender"),
-                    "question": input_payload.get("question"),
-                    "current_date": current_utc_date,
-                }
-                result = reminder_todo_crew.kickoff(inputs=todo_payload)
-                answer = getattr(result, "output", str(result))
-                insert_record(conversation_id, input_payload.get("question"), answer)
-                return JSONResponse(content={
-                    "type": "reminder_created",
-                    "question": input_payload.get("question"),
-                    "answer": answer
-                })
-            except Exception as e:
-                logger.exception("Error in /todoTask endpoint:")
-                raise HTTPException(status_code=500, detail=str(e))
-
-        elif reminder_type == "event":
-            try:
-                event_payload = {
-                    "sender": input_payload.get("sender"),
-                    "question": input_payload.get("question"),
-                    "current_date": current_utc_date,
-                    "local_tz": local_tz
-                }
-                result = reminder_event_crew.kickoff(inputs=event_payload)
-                answer = getattr(result, "output", str(result))
-                insert_record(conversation_id, input_payload.get("question"), answer)
-                return JSONResponse(content={
-                    "type": "event_created",
-                    "question": input_payload.get("question"),
-                    "answer": answer
-                })
-            except Exception as e:
-                logger.exception("Error in /event endpoint:")
-                raise HTTPException(status_code=500, detail=str(e))
-
-    elif category == "schedule_event" and input_payload.get("type") == "user_request":
-        try:
-            event_payload = {
-                "sender": input_payload.get("sender"),
-                "question": input_payload.get("question"),
-                "current_date": current_utc_date,
-                "local_tz": local_tz
-            }
-            result = reminder_event_crew.kickoff(inputs=event_payload)
-            answer = getattr(result, "output", str(result))
-            insert_record(conversation_id, input_payload.get("question"), answer)
-            return JSONResponse(content={
-                "type": "event_created",
-                "question": input_payload.get("question"),
-                "answer": answer
-            })
-        except Exception as e:
-            logger.exception("Error in /event endpoint:")
-            raise HTTPException(status_code=500, detail=str(e))
-        
-    elif category == "no_action" and input_payload.get("type") == "incoming_email":
+def _mailbox_result(email: dict, result) -> dict:
+    if isinstance(result, Exception):
+        logger.error(f"[Mailbox] Failed to process email {email.get('id')}: {result}")
+        return {"id": email.get("id"), "error": str(result)}
+    return {"id": email.get("id"), "answer": getattr(result, "raw", str(result))}
 
-        summary_payload = {
 
-            "id": input_payload["id"],
-            "receivedDateTime": input_payload["receivedDateTime"],  # must match 'timestamp'
-            "subject": input_payload["subject"],
-            "bodyPreview": input_payload["bodyPreview"],            # must match 'body'
-            "sender": input_payload["sender"],
-            "userId": input_payload["userId"]
+def sweep_mailbox(emails: list, max_workers: int = 8) -> list:
+    """
+    Process a backlog of incoming emails polled from a mailbox (onboarding,
+    replays after downtime). The whole backlog is categorized with
+    bulk_categorize, then non-actionable mail is summarized with
+    run_mailbox_parallel and actionable mail (including meeting requests) goes
+    through run_actionable_parallel. Spam and uncategorized mail is dropped.
+    Returns one result per email, in input order.
+    """
+    kept = [email for email in emails if not should_skip(
+        email.get("sender", ""), email.get("subject", ""), email.get("internetMessageHeaders"),
+        receiver=email.get("receiver", ""),
+    )]
+    labels = bulk_categorize([
+        {
+            "content": email.get("body") or email.get("bodyPreview", ""),
+            "type": "incoming_email",
+            "cache_key": incoming_email_cache_key(email.get("sender"), email.get("subject"), email.get("bodyPreview")),
         }
+        for email in kept
+    ])
+    no_action = [email for email, label in zip(kept, labels) if label == "no_action"]
+    actionable = [email for email, label in zip(kept, labels) if label in ("actionable_task", "schedule_event")]
+    logger.info(f"[Mailbox] Sweep of {len(emails)} emails: {len(actionable)} actionable, {len(no_action)} to summarize")
 
-        summary_execution_result = no_action_crew.kickoff(inputs=summary_payload)
-        answer = getattr(summary_execution_result, "output", str(summary_execution_result))
-        return {"type": "no_action","answer": answer}
-
-    else:
-        return {"type": "unknown_category","answer": "The message was skipped. Unknown Category."}
\ No newline at end of file
+    results = {}
+    for batch, run in ((no_action, run_mailbox_parallel), (actionable, run_actionable_parallel)):
+        if batch:
+            for email, result in zip(batch, run(batch, max_workers=max_workers)):
+                results[id(email)] = result
+    return [results.get(id(email), {"id": email.get("id"), "status": "dropped"}) for email in emails]
@@ -1,9 +1,11 @@
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from collections import namedtuple
+from contextlib import contextmanager
+from psycopg_pool import ConnectionPool
 from dotenv import load_dotenv
 from fastapi import UploadFile
 import requests
+from requests.adapters import HTTPAdapter
 import urllib.parse
 from typing import Optional
 
@@ -16,23 +18,33 @@ DB_URL = os.getenv("DATABASE_URL")
 if not DB_URL:
     raise RuntimeError("Environment variable DATABASE_URL is not set")
 
-def get_connection():
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+
+# One pool per process, shared by the request threads and the worker executors,
+# so each query borrows an open connection instead of paying TCP+TLS+auth again.
+_POOL = ConnectionPool(DB_URL, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX, open=True)
+
+@contextmanager
+def get_conn():
     """
-    Establish a new database connection using the DATABASE_URL.
+    Borrow a connection from the pool and give it back when the block exits.
+    Uncommitted work is rolled back on error; callers commit explicitly as before.
     """
-    return psycopg2.connect(DB_URL)
+    with _POOL.connection() as conn:
+        yield conn
 
 def get_or_create_user(name: str, email: str = None) -> int:
     """
     Find an existing user by name/email or create one if not found.
     Returns the user_id.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 "SELECT id FROM users WHERE name = %s AND email IS NOT DISTINCT FROM %s",
                 (name, email),
+                prepare=True,
             )
             row = cur.fetchone()
             if row:
@@ -45,31 +57,25 @@ def get_or_create_user(name: str, email: str = None) -> int:
             user_id = cur.fetchone()[0]
             conn.commit()
             return user_id
-    finally:
-        conn.close()
 
 def get_user_id_by_email(email: str) -> int:
     """
     Retrieve the user_id associated with the given email.
     Returns None if no user is found.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT id FROM users WHERE email = %s", (email,))
+            cur.execute("SELECT id FROM users WHERE email = %s", (email,), prepare=True)
             row = cur.fetchone()
             if row:
                 return row[0]
-    finally:
-        conn.close()
 
 def create_conversation(user_id: int) -> int:
     """
     Start a new conversation for the given user.
     Returns the conversation_id.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 "INSERT INTO conversations (user_id, last_message_at) VALUES (%s, NOW()) RETURNING id",
@@ -78,95 +84,79 @@ def create_conversation(user_id: int) -> int:
             conversation_id = cur.fetchone()[0]
             conn.commit()
             return conversation_id
-    finally:
-        conn.close()
 
 
-def insert_message(conversation_id: int, is_user: bool, content: str, file_urls: str = None) -> None:
+# Insert a message and touch its conversation in one round trip. The title
+# (if given) is only filled in while the conversation has none, which reads the
+# conversations row being updated anyway instead of counting its messages.
+_INSERT_MESSAGE_SQL = """
+    WITH ins AS (
+        INSERT INTO messages (conversation_id, is_user, content, file_urls)
+        VALUES (%(conversation_id)s, %(is_user)s, %(content)s, %(file_urls)s)
+    )
+    UPDATE conversations
+    SET last_message_at = NOW(),
+        title = COALESCE(NULLIF(title, ''), %(title)s::text, title)
+    WHERE id = %(conversation_id)s
+"""
+
+
+def insert_message(conversation_id: int, is_user: bool, content: str, file_urls: str = None, title: str = None) -> None:
     """
     Insert a message into the messages table and update the conversation's last_message_at.
+    When title is given and the conversation has no title yet, it becomes the conversation title.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO messages (conversation_id, is_user, content, file_urls) VALUES (%s, %s, %s, %s)",
-                (conversation_id, is_user, content, file_urls),
-            )
-            # keep track of when the conversation last saw activity
-            cur.execute(
-                "UPDATE conversations SET last_message_at = NOW() WHERE id = %s",
-                (conversation_id,),
-            )
+            cur.execute(_INSERT_MESSAGE_SQL, {
+                "conversation_id": conversation_id,
+                "is_user": is_user,
+                "content": content,
+                "file_urls": file_urls,
+                "title": title,
+            })
             conn.commit()
-    finally:
-        conn.close()
 
 
 def insert_reply_message(conversation_id: int, is_user: bool, content: str) -> None:
     """
     Insert a message into the messages table and update the conversation's last_message_at.
     """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO messages (conversation_id, is_user, content) VALUES (%s, %s, %s)",
-                (conversation_id, is_user, content),
-            )
-            # keep track of when the conversation last saw activity
-            cur.execute(
-                "UPDATE conversations SET last_message_at = NOW() WHERE id = %s",
-                (conversation_id,),
-            )
-            conn.commit()
-    finally:
-        conn.close()
+    insert_message(conversation_id, is_user, content)
 
 def insert_record(conversation_id: int, question: str, answer: str, file_urls: str = None) -> int:
     """
     Convenience function to record a QA interaction end-to-end:
-      1. Ensures the user exists (or creates them).
-      2. Creates a new conversation.
-      3. Inserts the user's question and agent's answer.
+      1. Inserts the user's question and agent's answer.
+      2. Names the conversation after the question if it has no title yet.
 
     Returns:
-        The new conversation_id.
+        The conversation_id.
     """
 
-    # record the back-and-forth
-    insert_message(conversation_id, True, question, file_urls)
-    insert_message(conversation_id, False, answer, file_urls) 
-    update_conversation_title(conversation_id, question)
+    # record the back-and-forth: both rows in one INSERT, one transaction, and
+    # pipeline mode sends the INSERT and UPDATE together in a single round trip
+    with get_conn() as conn:
+        with conn.pipeline(), conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO messages (conversation_id, is_user, content, file_urls) VALUES (%s, %s, %s, %s), (%s, %s, %s, %s)",
+                (conversation_id, True, question, file_urls, conversation_id, False, answer, file_urls),
+            )
+            cur.execute(
+                "UPDATE conversations SET last_message_at = NOW(), title = COALESCE(NULLIF(title, ''), %s) WHERE id = %s",
+                (question, conversation_id),
+            )
+        conn.commit()
     return conversation_id
 
 
-
-'''
-if __name__ == "__main__":
-    record_qa(conversation_id=1, question="Hello AI?", answer="Hello! How can I help you today?")
-'''
-def update_conversation_title(conversation_id: int, question: str) -> None:
-    """
-    Given a conversation_id and question, checks if the message is the first one in the conversation and if so,
-    updates the conversation title in the conversations table.
-    """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            # count the number of messages in the conversation
-            cur.execute("SELECT COUNT(*) FROM messages WHERE conversation_id = %s", (conversation_id,))
-            row = cur.fetchone()
-            print(row)
-            if row[0] == 2:
-                cur.execute("UPDATE conversations SET title = %s WHERE id = %s", (question, conversation_id))
-                conn.commit()
-    finally:
-        conn.close()
-
 # ========= File Upload =========
 FILE_SERVER_BASE = os.getenv("FILE_SERVER_BASE_URL", "https://api.nexiuslabs.com")
 
+# Keep-alive session for the file server, so uploads reuse open TLS connections.
+_file_session = requests.Session()
+_file_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
 def upload_file(folder_path: str, file: UploadFile) -> str:
     """
     Uploads a file to your file‐server.
@@ -178,41 +168,39 @@ def upload_file(folder_path: str, file: UploadFile) -> str:
     folder = folder_path.lstrip("/")
     # build a full URL safely
     upload_url = urllib.parse.urljoin(FILE_SERVER_BASE.rstrip("/") + "/", f"{folder}/{file.filename}")
-    # rewind and read
+    # rewind and stream the file object itself instead of reading it into memory
     file.file.seek(0)
-    data = file.file.read()
-    resp = requests.put(upload_url, data=data, stream=True)
+    resp = _file_session.put(upload_url, data=file.file)
     # raise on any HTTP error
     resp.raise_for_status()
     return upload_url
 
 #------------------------ TASK ---------------------------
 
+# Plain tuple rows are lighter to build than RealDictCursor's per-row dicts.
+Task = namedtuple("Task", "id user_id mail_id title detail due_at is_done created_at")
+
 def get_tasks_by_user_id(user_id: int):
     """
     Retrieve all tasks for a given user_id from the Tasks table.
-    Returns a list of dicts.
+    Returns a list of Task rows (use ._asdict() where a dict is needed).
     """
-    conn = get_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
             cur.execute("""
                 SELECT id, user_id, mail_id, title, detail, due_at, is_done, created_at
                 FROM Tasks
                 WHERE user_id = %s
                 ORDER BY due_at ASC NULLS LAST, created_at DESC
             """, (user_id,))
-            return cur.fetchall()
-    finally:
-        conn.close()
+            return [Task(*row) for row in cur.fetchall()]
 
 def insert_new_task(user_id: int, mail_id: str, title: str, detail: str, due_at: Optional[str] = None) -> int:
     """
     Insert a new task into the Tasks table.
     Returns the id of the new task.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             if due_at:
                 cur.execute("""
@@ -229,15 +217,12 @@ def insert_new_task(user_id: int, mail_id: str, title: str, detail: str, due_at:
             row = cur.fetchone()
             conn.commit()
             return row[0]
-    finally:
-        conn.close()
 
 def update_task_status(task_id: int, is_done: bool) -> None:
     """
     Update the is_done status of a task with given id.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 UPDATE Tasks
@@ -245,26 +230,21 @@ def update_task_status(task_id: int, is_done: bool) -> None:
                 WHERE id = %s
             """, (is_done, task_id))
             conn.commit()
-    finally:
-        conn.close()
 
 def list_tasks_by_user_id(user_id: int):
     """
     Retrieve all tasks for a given user_id from the Tasks table.
-    Returns a list of dicts.
+    Returns a list of Task rows (use ._asdict() where a dict is needed).
     """
-    conn = get_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
             cur.execute("""
                 SELECT id, user_id, mail_id, title, detail, due_at, is_done, created_at
                 FROM Tasks
                 WHERE user_id = %s
                 ORDER BY due_at ASC NULLS LAST, created_at DESC
             """, (user_id,))
-            return cur.fetchall()
-    finally:
-        conn.close()
+            return [Task(*row) for row in cur.fetchall()]
 
 #============ Email  =============
 def get_mail_id_by_task_id(task_id: int) -> int:
@@ -272,15 +252,32 @@ def get_mail_id_by_task_id(task_id: int) -> int:
     Retrieve mail_id associated with a given task_id from the Tasks table.
     Returns None if no task is found.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT mail_id FROM Tasks WHERE id = %s", (task_id,))
+            cur.execute("SELECT mail_id FROM Tasks WHERE id = %s", (task_id,), prepare=True)
             row = cur.fetchone()
             if row:
                 return row[0]
-    finally:
-        conn.close()
+
+def get_mail_ids_by_task_ids(task_ids: list) -> dict:
+    """
+    Retrieve the mail_id for each of the given task_ids in one query.
+    Returns a {task_id: mail_id} dict; unknown task ids are omitted.
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, mail_id FROM Tasks WHERE id = ANY(%s)", (list(task_ids),))
+            return {row[0]: row[1] for row in cur.fetchall()}
+
+def get_mail_ids_with_tasks(mail_ids: list) -> set:
+    """
+    Return the subset of mail_ids that already have at least one row in the
+    Tasks table, in one query.
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT mail_id FROM Tasks WHERE mail_id = ANY(%s)", (list(mail_ids),))
+            return {row[0] for row in cur.fetchall()}
 
 #=========== Email Table ===============
 def insert_email(user_id: int, mail_id: str, subject: str, body_summary: str, sender: str, body_detail: str) -> int:
@@ -288,8 +285,7 @@ def insert_email(user_id: int, mail_id: str, subject: str, body_summary: str, se
     Insert a new email into the Emails table.
     Returns the id of the new email.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO email_records (user_id, mail_id, subject, body_summary, sender, body_detail)
@@ -299,16 +295,33 @@ def insert_email(user_id: int, mail_id: str, subject: str, body_summary: str, se
             row = cur.fetchone()
             conn.commit()
             return row[0]
-    finally:
-        conn.close()
+
+
+def insert_emails(rows: list) -> None:
+    """
+    Insert many emails into the Emails table in one round trip and transaction.
+    rows are (user_id, mail_id, subject, body_summary, sender, body_detail) tuples;
+    rows that violate a unique constraint are skipped. Duplicate mail_ids are only
+    caught once migrations/001_email_records_mail_id_unique.sql has been applied.
+    """
+    if not rows:
+        return
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # psycopg runs executemany in pipeline mode: every row in one round trip
+            cur.executemany("""
+                INSERT INTO email_records (user_id, mail_id, subject, body_summary, sender, body_detail)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT DO NOTHING
+            """, rows)
+            conn.commit()
 
 
 def update_draft_reply(mail_id: str, ai_draft_reply: str) -> None:
     """
     Update the draft reply and body detail of a mail record with given mail_id.
     """
-    conn = get_connection()
-    try:
+    with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 UPDATE email_records
@@ -316,6 +329,4 @@ def update_draft_reply(mail_id: str, ai_draft_reply: str) -> None:
                 WHERE mail_id = %s
             """, (ai_draft_reply, mail_id))
             conn.commit()
-    finally:
-        conn.close()
 
@@ -1,4 +1,8 @@
 import os
+import time
+import hashlib
+import threading
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
@@ -9,10 +13,28 @@ ALGORITHM = os.getenv("JWT_ALGORITHM")
 
 bearer_scheme = HTTPBearer()
 
+# Decoded payloads of recently verified tokens, keyed by a SHA-256 prefix of the token.
+# An entry is trusted for at most JWT_CACHE_TTL seconds and never past the
+# token's own exp, so expiry still surfaces as a 401.
+JWT_CACHE_TTL = int(os.getenv("JWT_CACHE_TTL", "30"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+_jwt_cache = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)  # sha256(token)[:16] -> (payload, valid_until)
+_jwt_cache_lock = threading.Lock()
+
 def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
     token = credentials.credentials
+    key = hashlib.sha256(token.encode()).digest()[:16]  # the raw token is never stored
+    with _jwt_cache_lock:
+        hit = _jwt_cache.get(key)
+    if hit and hit[1] > time.time():
+        return hit[0]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        valid_until = time.time() + JWT_CACHE_TTL
+        if isinstance(payload.get("exp"), (int, float)):
+            valid_until = min(valid_until, payload["exp"])
+        with _jwt_cache_lock:
+            _jwt_cache[key] = (payload, valid_until)
         return payload
     except ExpiredSignatureError:
         raise HTTPException(
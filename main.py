@@ -3,11 +3,19 @@ from fastapi.exception_handlers import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
-from db_utils import insert_record, update_conversation_title, upload_file, update_draft_reply
-from crew import manager_orchestrator
+from db_utils import insert_record, upload_file, update_draft_reply
+from crew import manager_orchestrator, incoming_email_executor, warm_crews, current_utc_date
+import os
+import asyncio
+import functools
 import base64
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 import json
 from jwt_auth import verify_jwt_token
 from dotenv import load_dotenv
@@ -17,11 +25,7 @@ from fastapi import Body
 from fastapi.responses import JSONResponse
 import datetime
 from tools.reply_email_tool import reply_to_latest_email
-from tzlocal import get_localzone_name
-
-local_tz = get_localzone_name() 
-
-current_utc_date = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
+from tools.email_field_regex import parse_email_fields, parse_llm_json
 
 load_dotenv()
 
@@ -31,6 +35,10 @@ logger = getLogger(__name__)
 # Initialize FastAPI without global auth dependency
 app = FastAPI()
 
+@app.on_event("startup")
+def build_crews():
+    warm_crews()
+
 # Log validation errors for easier debugging
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -69,6 +77,7 @@ class IncomingEmailEvent(BaseModel):
       • sender      (sender’s email address)
       • receiver    (recipient’s email address = our user’s mailbox)
       • (optional) userId  – internal user ID, if we know it
+      • (optional) internetMessageHeaders – Graph [{name, value}] headers, used to drop list mail early
     """
     type: str
     id: str
@@ -79,10 +88,65 @@ class IncomingEmailEvent(BaseModel):
     receiver: str
     userId: Optional[int] = None
     receivedDateTime: Optional[str] = None
+    internetMessageHeaders: Optional[List[dict]] = None
 
 from fastapi import Form, File, UploadFile  # <— make sure these are imported
 import base64
 
+# Attachments are read and base64-encoded in chunks whose size is a multiple
+# of 3 bytes, so the encoded chunks join into the encoding of the whole file
+# without the raw file and its encoding being held in memory together.
+ATTACHMENT_CHUNK = 3 * 64 * 1024
+
+
+def _encode_file(fileobj) -> tuple:
+    """(size, base64 text) of a spooled upload, read chunk by chunk."""
+    encoded = []
+    size = 0
+    while chunk := fileobj.read(ATTACHMENT_CHUNK):
+        size += len(chunk)
+        encoded.append(base64.b64encode(chunk))
+    return size, b"".join(encoded).decode("ascii")
+
+
+async def read_attachment(f: UploadFile) -> dict:
+    """The attachment dict the orchestrator and send tools expect, for one uploaded file."""
+    # Reading and encoding both run on a worker thread: b64encode holds the GIL
+    # for the whole chunk, and small uploads are read from memory synchronously.
+    size, content = await run_in_threadpool(_encode_file, f.file)
+    return {
+        "filename": f.filename,
+        "size": size,
+        "content": content,
+        "content_type": f.content_type or "application/octet-stream",
+    }
+
+
+# Uploaded files of one request read at the same time.
+ATTACHMENT_READ_CONCURRENCY = 8
+
+
+async def read_attachments(files: Optional[List[UploadFile]]) -> list:
+    """read_attachment for every uploaded file concurrently, in upload order."""
+    slots = asyncio.Semaphore(ATTACHMENT_READ_CONCURRENCY)
+
+    async def read(f: UploadFile) -> dict:
+        async with slots:
+            return await read_attachment(f)
+    return list(await asyncio.gather(*(read(f) for f in files or [])))
+
+# Blocking crew and Graph work of the JWT-protected endpoints runs here, off the
+# event loop and outside Starlette's shared 40-thread pool, so slow LLM calls
+# can overlap without starving uploads and other sync handlers.
+CREW_REQUEST_WORKERS = int(os.getenv("CREW_REQUEST_WORKERS", "64"))
+crew_request_executor = ThreadPoolExecutor(max_workers=CREW_REQUEST_WORKERS, thread_name_prefix="crew-request")
+
+
+async def run_crew_call(fn, *args, **kwargs):
+    """Await a blocking call on crew_request_executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(crew_request_executor, functools.partial(fn, *args, **kwargs))
+
 # …
 @app.post("/ask", dependencies=[Depends(verify_jwt_token)], response_model=AnswerResponse)
 async def ask_question(
@@ -102,16 +166,7 @@ async def ask_question(
     """
     try:
         # 1) Read & encode attachments, if any
-        attachments = []
-        if files:
-            for f in files:
-                data = await f.read()
-                attachments.append({
-                    "filename": f.filename,
-                    "size": len(data),
-                    "content": base64.b64encode(data).decode("utf-8"),
-                    "content_type": f.content_type or "application/octet-stream",
-                })
+        attachments = await read_attachments(files)
 
         # 2) Build the payload for your orchestrator
         orchestrator_input = {
@@ -122,8 +177,8 @@ async def ask_question(
             "attachments": attachments or None,
         }
 
-        # 3) Dispatch to crew.py
-        result = manager_orchestrator(orchestrator_input)
+        # 3) Dispatch to crew.py, off the event loop so other requests keep being served
+        result = await run_crew_call(manager_orchestrator, orchestrator_input)
         return result
 
     except Exception as e:
@@ -132,35 +187,52 @@ async def ask_question(
 
 # Incoming email webhook: no auth required
 @app.post("/incoming_email")
-def incoming_email(event: IncomingEmailEvent):
+async def incoming_email(event: IncomingEmailEvent):
     """
     Receives a webhook POST whenever a new email arrives. The body must match IncomingEmailEvent.
     We forward the payload into manager_orchestrator, which will run email_task_pipeline and return
     whatever the pipeline returned (either “dropped” or a list of tasks).
+    Each webhook runs on incoming_email_executor, so bursts of mail are processed concurrently.
     """
     try:
         orchestrator_input = event.dict()
-        result = manager_orchestrator(orchestrator_input)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(incoming_email_executor, manager_orchestrator, orchestrator_input)
         return {"status": "ok", "detail": result}
 
     except Exception as e:
         logging.exception("Error in /incoming_email endpoint:")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batched incoming emails: protected (pollers and replays, not the Graph webhook)
+from crew import manager_orchestrator_batch
+
+@app.post("/incoming_email/batch", dependencies=[Depends(verify_jwt_token)])
+async def incoming_email_batch(events: List[IncomingEmailEvent] = Body(...)):
+    """
+    Same as /incoming_email for a list of payloads, orchestrated concurrently.
+    Returns one result per email, in input order.
+    """
+    try:
+        results = await run_crew_call(manager_orchestrator_batch, [event.dict() for event in events])
+        return {"status": "ok", "detail": results}
+    except Exception as e:
+        logger.exception("Error in /incoming_email/batch endpoint:")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # File upload endpoint: protected
 @app.post("/upload", dependencies=[Depends(verify_jwt_token)])
 def upload_file_endpoint(file: UploadFile = File(...)):
     try:
-        contents = file.file.read()
-        b64data = base64.b64encode(contents).decode("utf-8")
-        upload_file(file.filename, b64data)  # reuse upload logic
+        # Streamed from the spooled upload by upload_file; never read into memory here
+        upload_file("uploads", file)
         return {"filename": file.filename}
     except Exception as e:
         logging.exception("Error uploading file:")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Draft reply endpoint: protected
-from crew import email_draft_reply_crew
+from crew import get_email_draft_reply_crew, prefetch_reply_context, kickoff_crew
 from pydantic import BaseModel
 
 class DraftReplyRequest(BaseModel):
@@ -182,16 +254,7 @@ async def draft_reply_endpoint(
     """
     try:
         # 1) Read & encode attachments, if any
-        attachments = []
-        if files:
-            for f in files:
-                data = await f.read()
-                attachments.append({
-                    "filename": f.filename,
-                    "size": len(data),
-                    "content": base64.b64encode(data).decode("utf-8"),
-                    "content_type": f.content_type or "application/octet-stream",
-                })
+        attachments = await read_attachments(files)
 
         # 2) Build the payload for your orchestrator
         send_payload = {
@@ -201,7 +264,8 @@ async def draft_reply_endpoint(
             "mail_id": mail_id
         }
 
-        result = reply_to_latest_email.run(
+        result = await run_crew_call(
+            reply_to_latest_email.run,
             sender_email=sender,
             comment=question,
             attachment=attachments if attachments else None,
@@ -223,7 +287,7 @@ class PreviewDraftReplyRequest(BaseModel):
     mail_id: str
 
 @app.post("/draftReplyPreview", dependencies=[Depends(verify_jwt_token)])
-def preview_draft_reply_endpoint(
+async def preview_draft_reply_endpoint(
     mail_id: str = Form(...),
     sender: str = Form(...)):
     """
@@ -233,9 +297,10 @@ def preview_draft_reply_endpoint(
     try:
         payload = {
             "mail_id": mail_id,
-            "sender_email": sender
+            "sender_email": sender,
+            **await run_crew_call(prefetch_reply_context, mail_id, sender),
         }
-        result = email_draft_reply_crew.kickoff(inputs=payload)
+        result = await run_crew_call(kickoff_crew, get_email_draft_reply_crew, payload)
         answer = getattr(result, "output", str(result))
         return JSONResponse(content={
             "type": "draft_preview",
@@ -250,6 +315,23 @@ class SendEmailRequest(BaseModel):
     sender: str
     attachments: Optional[list] = None
 
+# The Graph send runs in the background: /sendEmail answers as soon as the
+# send is queued and the outcome is kept here for GET /sendEmail/{send_id}.
+send_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="send-email")
+send_status = TTLCache(maxsize=10_000, ttl=24 * 60 * 60)  # send_id -> queued | sent | failed
+send_status_lock = threading.Lock()
+
+
+def _record_send_status(send_id: str, receiver: str, future) -> None:
+    try:
+        status = "sent" if future.result() else "failed"
+    except Exception:
+        logger.exception(f"Background send to {receiver} failed")
+        status = "failed"
+    logger.info(f"Email {send_id} to {receiver}: {status}")
+    with send_status_lock:
+        send_status[send_id] = status
+
 @app.post("/sendEmail", dependencies=[Depends(verify_jwt_token)])
 async def send_email_endpoint(
     question: str = Form(...),
@@ -262,16 +344,7 @@ async def send_email_endpoint(
     """
     try:
         # 1) Read & encode attachments, if any
-        attachments = []
-        if files:
-            for f in files:
-                data = await f.read()
-                attachments.append({
-                    "filename": f.filename,
-                    "size": len(data),
-                    "content": base64.b64encode(data).decode("utf-8"),
-                    "content_type": f.content_type or "application/octet-stream",
-                })
+        attachments = await read_attachments(files)
 
         # 2) Build the payload for your orchestrator
         send_payload = {
@@ -281,42 +354,58 @@ async def send_email_endpoint(
         }
 
         logger.info(f"[Orchestrator] Sending email: {send_payload}")
-        send_result = email_onboard_crew.kickoff(inputs=send_payload)
-        raw_output = str(send_result)
-
-        # Strip triple backticks and markdown labeling if present
-        clean_output = raw_output.strip().removeprefix('"json').removesuffix('"""').strip()
-
-        # Now parse clean JSON
-        final_json = json.loads(clean_output)
+        final_json = parse_email_fields(question, sender)
+        if final_json is None:
+            # Free-form text: fall back to the LLM extractor
+            send_result = await run_crew_call(kickoff_crew, get_email_onboard_crew, send_payload)
+            fields = getattr(send_result, "pydantic", None)
+            final_json = fields.model_dump() if fields is not None else parse_llm_json(str(send_result))
         sender = sender
         receiver = final_json.get("receiver")
         subject = final_json.get("subject")
         content = final_json.get("content")
         attachments = attachments
 
-        result = send_email.run(
+        send_id = uuid.uuid4().hex
+        with send_status_lock:
+            send_status[send_id] = "queued"
+        future = send_pool.submit(
+            send_email.run,
             sender=sender,
             receiver=receiver,
             subject=subject,
             content=question,
             attachments=attachments if attachments else None
         )
-        if result:
-            answer = f"Email was sent to {receiver} successfully"
-        else:
-            answer = "Sorry, there is problem occured. Failed to Sent Email"
-        return JSONResponse(content={"type": "email_sent", "question": question, "answer": answer})
+        future.add_done_callback(lambda f: _record_send_status(send_id, receiver, f))
+        answer = f"Email to {receiver} is being sent"
+        return JSONResponse(content={
+            "type": "email_sent",
+            "status": "queued",
+            "send_id": send_id,
+            "question": question,
+            "answer": answer
+        })
     except Exception as e:
         logger.exception("Error in /sendEmail endpoint:")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/sendEmail/{send_id}", dependencies=[Depends(verify_jwt_token)])
+def send_email_status_endpoint(send_id: str):
+    """Status of a queued send: queued, sent or failed."""
+    with send_status_lock:
+        status = send_status.get(send_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired send_id")
+    return {"send_id": send_id, "status": status}
+
 # ──────────────────────────────────────────────────────────────
 # Reminder Endpoint (from crew.py logic)
 # ──────────────────────────────────────────────────────────────
 
-from crew import email_onboard_crew, reminder_crew, reminder_todo_crew
-from crew import send_email
+from crew import get_email_onboard_crew, get_reminder_todo_crew, classify_reminder_type, create_event, reminder_answer
+from tools.format_reminder import format_todo_preview
+from tools.send_email_tool import send_email
 
 
 class ReminderRequest(BaseModel):
@@ -324,7 +413,7 @@ class ReminderRequest(BaseModel):
     question: str
 
 @app.post("/todoTask", dependencies=[Depends(verify_jwt_token)])
-def todo_task_endpoint(request: ReminderRequest = Body(...)):
+async def todo_task_endpoint(request: ReminderRequest = Body(...)):
     """
     Endpoint to create a Microsoft To Do reminder task for a user.
     Accepts: {email, task_title, task_body (optional), due_date_time (optional)}
@@ -335,10 +424,10 @@ def todo_task_endpoint(request: ReminderRequest = Body(...)):
         reminder_payload = {
             "sender": input_payload.get("sender"),
             "question": input_payload.get("question"),
-            "current_date": current_utc_date,
+            "current_date": current_utc_date(),
         }
-        result = reminder_todo_crew.kickoff(inputs=reminder_payload)
-        answer = getattr(result, "output", str(result))
+        result = await run_crew_call(kickoff_crew, get_reminder_todo_crew, reminder_payload)
+        answer = reminder_answer(result, format_todo_preview)
         return JSONResponse(content={
             "type": "reminder_created",
             "question": input_payload.get("question"),
@@ -350,20 +439,14 @@ def todo_task_endpoint(request: ReminderRequest = Body(...)):
 
 
 @app.post("/reminder", dependencies=[Depends(verify_jwt_token)])
-def reminder_endpoint(request: ReminderRequest = Body(...)):
+async def reminder_endpoint(request: ReminderRequest = Body(...)):
     """
     Endpoint to create a Microsoft To Do reminder task for a user.
     Accepts: {email, task_title, task_body (optional), due_date_time (optional)}
     """
     try:
         input_payload = request.dict()
-        # Prepare the payload for the crew
-        reminder_payload = {
-            "sender": input_payload.get("sender"),
-            "question": input_payload.get("question"),
-        }
-        result = reminder_crew.kickoff(inputs=reminder_payload)
-        answer = getattr(result, "output", str(result))
+        answer = await run_crew_call(classify_reminder_type, input_payload.get("question"), input_payload.get("sender"))
         return JSONResponse(content={
             "type": "reminder_created",
             "question": input_payload.get("question"),
@@ -379,7 +462,7 @@ class EventRequest(BaseModel):
     question: str
 
 @app.post("/event", dependencies=[Depends(verify_jwt_token)])
-def event_endpoint(request: EventRequest = Body(...)):
+async def event_endpoint(request: EventRequest = Body(...)):
     """
     Endpoint to create a calendar event or event reminder for a user.
     Accepts: {sender, question}
@@ -389,12 +472,9 @@ def event_endpoint(request: EventRequest = Body(...)):
         event_payload = {
             "sender": input_payload.get("sender"),
             "question": input_payload.get("question"),
-            "current_date": current_utc_date,
-            "local_tz": local_tz
+            "current_date": current_utc_date()
         }
-        from crew import reminder_event_crew
-        result = reminder_event_crew.kickoff(inputs=event_payload)
-        answer = getattr(result, "output", str(result))
+        answer = await run_crew_call(create_event, event_payload)
         return JSONResponse(content={
             "type": "event_created",
             "question": input_payload.get("question"),
@@ -407,3 +487,50 @@ def event_endpoint(request: EventRequest = Body(...)):
 
 
 
+
+
+# Mailbox sweep endpoint: protected
+from crew import sweep_mailbox
+
+@app.post("/mailbox/sweep", dependencies=[Depends(verify_jwt_token)])
+async def mailbox_sweep_endpoint(emails: List[IncomingEmailEvent] = Body(...)):
+    """
+    Process a backlog of emails polled from a mailbox in one request: bulk
+    categorization, then summaries and actionable-email crews in parallel.
+    Accepts a list of incoming-email payloads; returns one result per email.
+    """
+    try:
+        results = await run_crew_call(sweep_mailbox, [email.dict() for email in emails])
+        return {"status": "ok", "detail": results}
+    except Exception as e:
+        logger.exception("Error in /mailbox/sweep endpoint:")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Offline inbox backfill through the Batch API: protected
+from agents.batch_submit import sync_full_inbox, collect_analysis_batch
+
+@app.post("/mailbox/backfill", dependencies=[Depends(verify_jwt_token)])
+async def mailbox_backfill_endpoint(emails: List[IncomingEmailEvent] = Body(...)):
+    """
+    Queue task extraction for a whole mailbox as one Batch API job.
+    Returns the batch_id to poll with GET /mailbox/backfill/{batch_id}.
+    """
+    try:
+        batch_id = await run_crew_call(sync_full_inbox, [email.dict() for email in emails])
+        return {"status": "queued" if batch_id else "empty", "batch_id": batch_id}
+    except Exception as e:
+        logger.exception("Error in /mailbox/backfill endpoint:")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/mailbox/backfill/{batch_id}", dependencies=[Depends(verify_jwt_token)])
+async def mailbox_backfill_status_endpoint(batch_id: str):
+    """Store the tasks of a finished backfill batch; "running" until the batch is done."""
+    try:
+        results = await run_crew_call(collect_analysis_batch, batch_id)
+        if results is None:
+            return {"status": "running", "batch_id": batch_id}
+        return {"status": "done", "batch_id": batch_id, "detail": results}
+    except Exception as e:
+        logger.exception("Error in /mailbox/backfill status endpoint:")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,18 @@
+-- Unique mail_id on email_records, so insert_emails (db_utils.py) skips emails
+-- that are already stored instead of inserting a duplicate row.
+--
+-- Run once with psql, outside a transaction (CREATE INDEX CONCURRENTLY cannot
+-- run inside one):
+--   psql "$DATABASE_URL" -f migrations/001_email_records_mail_id_unique.sql
+--
+-- Webhook retries may already have stored a mail twice; keep the first row of
+-- each mail_id (update_draft_reply writes the same draft to every copy).
+DELETE FROM email_records dup
+USING email_records kept
+WHERE dup.mail_id = kept.mail_id
+  AND dup.id > kept.id;
+
+-- CONCURRENTLY builds the index without blocking inserts. If it fails it leaves
+-- an INVALID index behind: drop email_records_mail_id_key and run this again.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS email_records_mail_id_key
+    ON email_records (mail_id);
@@ -0,0 +1,48 @@
+import os
+import logging
+import threading
+from collections import deque
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TURNS = int(os.getenv("CONVERSATION_MEMORY_TURNS", "8"))
+MEMORY_TTL = int(os.getenv("CONVERSATION_MEMORY_TTL", str(60 * 60)))
+TURN_CHARS = 240  # ~64 tokens per side of a turn
+
+
+def _clip(text: str) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= TURN_CHARS else text[:TURN_CHARS - 1] + "…"
+
+
+class ConversationMemory:
+    """
+    Bounded per-conversation history for the chat agent.
+
+    Keeps the last `turns` exchanges of each conversation, each clipped to about
+    64 tokens per side, so the context sent with a turn stays under ~1k tokens
+    no matter how long the conversation runs. Idle conversations expire after `ttl`.
+    """
+
+    def __init__(self, turns: int = MEMORY_TURNS, ttl: int = MEMORY_TTL, maxsize: int = 10_000):
+        self._lock = threading.Lock()
+        self._turns = turns
+        self._history = TTLCache(maxsize=maxsize, ttl=ttl)  # conversation_id -> deque of turns
+
+    def history(self, conversation_id) -> str:
+        """Earlier turns as text, oldest first, or "(none)" for a new conversation."""
+        with self._lock:
+            turns = list(self._history.get(conversation_id) or ())
+        return "\n".join(turns) if turns else "(none)"
+
+    def remember(self, conversation_id, question: str, answer: str) -> None:
+        if conversation_id in (None, ""):
+            return
+        with self._lock:
+            turns = self._history.get(conversation_id)
+            if turns is None:
+                turns = deque(maxlen=self._turns)
+            turns.append(f"User: {_clip(question)}\nAssistant: {_clip(answer)}")
+            self._history[conversation_id] = turns  # re-set to refresh the TTL
@@ -1,6 +1,10 @@
 import os
+import threading
+from functools import lru_cache
+from cachetools import TTLCache
 import msal
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import timedelta
 from dateutil import parser
 from dotenv import load_dotenv
@@ -11,20 +15,50 @@ load_dotenv()
 
 GRAPH_API_ENDPOINT = "https://graph.microsoft.com/v1.0"
 
-def get_app_token():
-    app = msal.ConfidentialClientApplication(
+# Keep-alive session for Graph, so the UPN lookup and the event POST of one
+# request (and later requests) reuse an open TLS connection.
+graph_session = requests.Session()
+graph_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=50))
+
+# --- UPN Cache ---
+# userPrincipalName keyed by lowercased mail address; event creation resolves
+# the same few senders over and over, and directory UPNs rarely change.
+UPN_CACHE_TTL = int(os.getenv("UPN_CACHE_TTL", "3600"))
+upn_cache = TTLCache(maxsize=1024, ttl=UPN_CACHE_TTL)
+upn_cache_lock = threading.Lock()
+
+GRAPH_SCOPES = ["https://graph.microsoft.com/.default"]
+
+# Serializes token refreshes so concurrent event creations do not all hit AAD
+# when the cached token expires.
+_token_refresh_lock = threading.Lock()
+
+@lru_cache()
+def get_graph_app() -> msal.ConfidentialClientApplication:
+    """
+    Lazily build one MSAL app per process; its in-memory token cache then
+    serves every call until shortly before the token expires.
+    """
+    return msal.ConfidentialClientApplication(
         client_id=os.getenv("CLIENT_ID"),
         client_credential=os.getenv("CLIENT_SECRET"),
         authority=f"https://login.microsoftonline.com/{os.getenv('TENANT_ID')}"
     )
-    result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    if "access_token" not in result:
+
+def get_app_token():
+    app = get_graph_app()
+    result = app.acquire_token_silent(GRAPH_SCOPES, account=None)
+    if not result:
+        with _token_refresh_lock:
+            # Another thread may have refreshed the token while this one waited
+            result = app.acquire_token_silent(GRAPH_SCOPES, account=None) or app.acquire_token_for_client(scopes=GRAPH_SCOPES)
+    if not result or "access_token" not in result:
         raise Exception("Could not acquire access token")
     return result["access_token"]
 
 def graph_get(endpoint, token, params=None):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{GRAPH_API_ENDPOINT}{endpoint}", headers=headers, params=params)
+    response = graph_session.get(f"{GRAPH_API_ENDPOINT}{endpoint}", headers=headers, params=params)
     response.raise_for_status()
     return response.json()
 
@@ -33,11 +67,22 @@ def graph_post(endpoint, token, payload):
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
-    response = requests.post(f"{GRAPH_API_ENDPOINT}{endpoint}", headers=headers, json=payload)
+    response = graph_session.post(f"{GRAPH_API_ENDPOINT}{endpoint}", headers=headers, json=payload)
     response.raise_for_status()
     return response.json()
 
 def find_upn_by_email(token, email):
+    key = email.strip().lower()
+    with upn_cache_lock:
+        upn = upn_cache.get(key)
+    if upn is not None:
+        return upn
+    upn = _lookup_upn(token, email)
+    with upn_cache_lock:
+        upn_cache[key] = upn
+    return upn
+
+def _lookup_upn(token, email):
     safe_email = email.replace("'", "''")
     params = {
         "$filter": f"mail eq '{safe_email}'",
@@ -110,7 +155,14 @@ def create_calendar_event_tool(
             ]
         }
 
-        event = graph_post(f"/users/{upn}/calendar/events", token, payload)
+        try:
+            event = graph_post(f"/users/{upn}/calendar/events", token, payload)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                # The cached UPN no longer resolves (renamed or removed user)
+                with upn_cache_lock:
+                    upn_cache.pop(sender_email.strip().lower(), None)
+            raise
 
         return (
             f"✅ Event Created!\n"
@@ -0,0 +1,36 @@
+import re
+from typing import List, Tuple
+
+EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+SIGNATURE_RE = re.compile(r"^\s*(Best regards|Kind regards|Sincerely|Regards),?\s*$", re.I | re.M)
+PLACEHOLDER_RE = re.compile(r"\{[a-zA-Z_]+\}|<[a-zA-Z_ ]+>|\[(?:name|recipient|your name)\]", re.I)
+MAX_SUBJECT_LENGTH = 200
+
+
+def validate_draft(draft: dict) -> Tuple[bool, List[str]]:
+    """
+    Deterministic structural review of a drafted email.
+    Returns (ok, problems); problems is a list of human-readable issues.
+    """
+    problems = []
+    receiver = (draft.get("receiver") or "").strip()
+    subject = (draft.get("subject") or "").strip()
+    content = draft.get("content") or ""
+
+    if not EMAIL_RE.fullmatch(receiver):
+        problems.append(f"receiver '{receiver}' is not an email address")
+    if not subject:
+        problems.append("subject is empty")
+    elif len(subject) >= MAX_SUBJECT_LENGTH:
+        problems.append(f"subject is longer than {MAX_SUBJECT_LENGTH} characters")
+    if not content.strip():
+        problems.append("content is empty")
+    elif not SIGNATURE_RE.search(content):
+        problems.append("content does not end with a signature (e.g. 'Best regards,')")
+    for text in (subject, content):
+        match = PLACEHOLDER_RE.search(text)
+        if match:
+            problems.append(f"unfilled placeholder {match.group(0)}")
+            break
+
+    return not problems, problems
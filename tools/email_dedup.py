@@ -0,0 +1,121 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+from datasketch import MinHash, MinHashLSH
+
+logger = logging.getLogger(__name__)
+
+DEDUP_TTL = int(os.getenv("EMAIL_DEDUP_TTL", str(24 * 60 * 60)))
+DEDUP_MAXSIZE = int(os.getenv("EMAIL_DEDUP_MAXSIZE", "10000"))
+DEDUP_THRESHOLD = float(os.getenv("EMAIL_DEDUP_THRESHOLD", "0.8"))
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+
+_URL_RE = re.compile(r"https?://\S+|www\.\S+", re.I)
+# Dates only, not times of day: "call at 15:00" and "call at 17:00" are different requests.
+_DATE_RE = re.compile(
+    r"\b\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}\b"                 # 2024-06-01, 01/06/2024
+    r"|\b(mon|tue|wed|thu|fri|sat|sun)[a-z]*,?\s+\d{1,2}\s+[a-z]{3,9}\s+\d{4}\b",
+    re.I,
+)
+# Tracking and message ids: long runs of letters/digits that contain a digit.
+# Short numbers (amounts, invoice numbers, times) are kept so distinct mails never
+# share an exact key; small template differences are left to the LSH.
+_TRACKING_ID_RE = re.compile(r"\b(?=[\w-]*\d)[\w-]{12,}\b")
+_SPACE_RE = re.compile(r"\s+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,:]\d+)*")
+
+
+def normalize_body(text: str) -> str:
+    """Lower-case text and strip URLs, dates, tracking ids and extra whitespace."""
+    text = _URL_RE.sub(" ", text or "")
+    text = _DATE_RE.sub(" ", text)
+    text = _TRACKING_ID_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip().lower()
+
+
+def _numbers(normalized: str) -> tuple:
+    """Numbers left after normalization (times, amounts, invoice numbers); near-duplicates must share them."""
+    return tuple(_NUMBER_RE.findall(normalized))
+
+
+def _minhash(normalized: str) -> MinHash:
+    signature = MinHash(num_perm=NUM_PERM)
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(max(len(normalized) - SHINGLE_SIZE + 1, 1))}
+    for shingle in shingles:
+        signature.update(shingle.encode("utf-8"))
+    return signature
+
+
+class EmailDeduplicator:
+    """
+    Exact + near-duplicate detection over recently processed email bodies, per mailbox.
+
+    Exact matches use an MD5 of the owner plus the normalized body; near-duplicates
+    (same mailer template with different tracking ids or dates) are found
+    with a MinHash LSH index and must also carry the same numbers, so mails that
+    differ only in a time or an amount are never merged. LSH keys carry the
+    owner too, so the same mail delivered to several mailboxes is still
+    processed once for each of them.
+    Only the id of the first email is kept, never its result: a duplicate is
+    reported, not answered with another run's output. Entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: int = DEDUP_TTL, maxsize: int = DEDUP_MAXSIZE, threshold: float = DEDUP_THRESHOLD):
+        self._lock = threading.Lock()
+        self._digests = TTLCache(maxsize=maxsize, ttl=ttl)   # md5(owner + body) -> mail_id
+        self._seen = TTLCache(maxsize=maxsize, ttl=ttl)      # LSH key -> (mail_id, numbers), for expiry
+        self._lsh = MinHashLSH(threshold=threshold, num_perm=NUM_PERM)
+
+    @staticmethod
+    def _owner(owner) -> str:
+        return str(owner or "").strip().lower()
+
+    @staticmethod
+    def _digest(owner: str, normalized: str) -> str:
+        return hashlib.md5(f"{owner}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def lookup(self, owner, body: str) -> Optional[str]:
+        """Return the mail_id of a previously processed duplicate of body in owner's mailbox, if any."""
+        owner = self._owner(owner)
+        normalized = normalize_body(body)
+        if not normalized:
+            return None
+        digest = self._digest(owner, normalized)
+        prefix = owner + "\x00"
+
+        with self._lock:
+            mail_id = self._digests.get(digest)
+            if mail_id is not None:
+                logger.info(f"Exact duplicate of email {mail_id}")
+                return mail_id
+
+            for candidate in self._lsh.query(_minhash(normalized)):
+                if candidate not in self._seen:
+                    self._lsh.remove(candidate)  # expired from the TTL cache
+                    continue
+                mail_id, numbers = self._seen[candidate]
+                if candidate.startswith(prefix) and numbers == _numbers(normalized):
+                    logger.info(f"Near-duplicate of email {mail_id}")
+                    return mail_id
+        return None
+
+    def remember(self, owner, mail_id: str, body: str) -> None:
+        """Record that mail_id was processed for owner so later duplicates in that mailbox are skipped."""
+        owner = self._owner(owner)
+        normalized = normalize_body(body)
+        if not normalized or not mail_id:
+            return
+        key = f"{owner}\x00{mail_id}"
+
+        with self._lock:
+            self._digests[self._digest(owner, normalized)] = mail_id
+            self._seen[key] = (mail_id, _numbers(normalized))
+            if key in self._lsh:
+                self._lsh.remove(key)
+            self._lsh.insert(key, _minhash(normalized))
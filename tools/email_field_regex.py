@@ -0,0 +1,57 @@
+import re
+import json
+import logging
+from typing import Optional
+from crewai.tools import tool
+
+logger = logging.getLogger(__name__)
+
+# Matches the "To : … / Subject : …" layout produced by format_email, with an
+# optional leading "From :" line and the trailing commas format_email adds.
+_FIELD_RE = re.compile(
+    r"^(?:From\s*:\s*(?P<sender>[^\n]+?)[\s,]*\n\s*)?"
+    r"To\s*:\s*(?P<receiver>[^\n]+?)[\s,]*\n\s*"
+    r"Subject\s*:\s*(?P<subject>[^\n]+?)[\s,]*\n\s*"
+    r"(?P<body>\S.*)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Markdown code fence an LLM may wrap its JSON answer in (```json ... ```).
+_JSON_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(?P<body>.*?)\s*```\s*$", re.IGNORECASE | re.DOTALL)
+
+
+def parse_llm_json(text: str) -> dict:
+    """json.loads an LLM answer, tolerating a surrounding markdown code fence."""
+    text = (text or "").strip()
+    match = _JSON_FENCE_RE.match(text)
+    return json.loads(match.group("body") if match else text)
+
+
+def parse_email_fields(text: str, sender_email: str = "") -> Optional[dict]:
+    """
+    Extract sender, receiver, subject and body from formatted email text.
+    Returns None when the text does not follow the layout, so callers can
+    fall back to the LLM extractor.
+    """
+    match = _FIELD_RE.match((text or "").strip())
+    if not match:
+        return None
+    return {
+        "sender": match.group("sender") or sender_email,
+        "receiver": match.group("receiver"),
+        "subject": match.group("subject"),
+        "body": match.group("body").strip(),
+    }
+
+
+@tool("extract_email_fields_deterministic")
+def extract_email_fields_deterministic(question: str, sender_email: str = "") -> str:
+    """
+    Parse a formatted email ("To : …", "Subject : …", blank line, body) into JSON
+    with sender, receiver, subject and body. Returns an error JSON if the text
+    does not follow that layout.
+    """
+    fields = parse_email_fields(question, sender_email)
+    if fields is None:
+        return json.dumps({"error": "Text is not in the 'To : / Subject :' email format"})
+    return json.dumps(fields)
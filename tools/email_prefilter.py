@@ -0,0 +1,110 @@
+import os
+import re
+import logging
+import threading
+from typing import List, Optional
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Automated / bulk senders that never need human action.
+_AUTOMATED_SENDER_RE = re.compile(r"(no[-_.]?reply|newsletters?|notifications?|marketing|donotreply|mailer-daemon)@", re.I)
+_BLOCKED_DOMAINS = frozenset({
+    "mailchimp.com",
+    "mcsv.net",
+    "sendgrid.net",
+    "linkedin.com",
+    "facebookmail.com",
+    "mailgun.org",
+    "substack.com",
+    "constantcontact.com",
+    "hubspotemail.net",
+    "amazonses.com",
+    "sparkpostmail.com",
+})
+_BULK_SUBJECT_RE = re.compile(r"\b(unsubscribe|newsletter|digest|weekly update)\b", re.I)
+# Auto-replies and bounces from real mailboxes. They are dropped, but their
+# senders are people, so they never count towards the repeat-drop list.
+_AUTO_REPLY_SUBJECT_RE = re.compile(
+    r"^\s*(automatic reply|auto[- ]?reply|autoreply|out of (the )?office|undeliverable|"
+    r"delivery status notification|mail delivery (failed|failure))\b",
+    re.I,
+)
+_AUTO_REPLY_HEADERS = frozenset({"x-autoreply", "x-autorespond"})
+
+# Mailing-list and auto-generated mail announces itself in its headers (RFC 2369, 3834).
+_LIST_HEADERS = frozenset({"list-unsubscribe", "list-id"})
+_BULK_PRECEDENCE = frozenset({"bulk", "list", "junk"})
+
+# Senders dropped repeatedly by the sender/domain/header rules are dropped on
+# sight afterwards, so unknown bulk domains are learned within a few messages.
+# Keyed by (receiver, sender).
+REPEAT_DROP_LIMIT = 3
+REPEAT_DROP_TTL = int(os.getenv("PREFILTER_REPEAT_DROP_TTL", str(7 * 24 * 60 * 60)))
+_dropped_senders = TTLCache(maxsize=50_000, ttl=REPEAT_DROP_TTL)
+_dropped_senders_lock = threading.Lock()
+
+
+def _sender_address(sender: str) -> str:
+    return (sender or "").strip().strip("<>").lower()
+
+
+def _sender_domain(sender: str) -> str:
+    return _sender_address(sender).rpartition("@")[2]
+
+
+def _has_bulk_headers(headers: Optional[List[dict]]) -> bool:
+    """True for Graph internetMessageHeaders ([{"name", "value"}]) that mark list or auto-generated mail."""
+    for header in headers or []:
+        name = (header.get("name") or "").strip().lower()
+        value = (header.get("value") or "").strip().lower()
+        if name in _LIST_HEADERS:
+            return True
+        if name == "precedence" and value in _BULK_PRECEDENCE:
+            return True
+        if name == "auto-submitted" and value and value != "no":
+            return True
+    return False
+
+
+def _is_auto_reply(subject: str, headers: Optional[List[dict]]) -> bool:
+    if _AUTO_REPLY_SUBJECT_RE.search(subject or ""):
+        return True
+    return any((header.get("name") or "").strip().lower() in _AUTO_REPLY_HEADERS for header in headers or [])
+
+
+def _is_noise_sender(sender: str, headers: Optional[List[dict]]) -> bool:
+    """True when the sender address, its domain, or the message headers mark the mail as automated."""
+    if _AUTOMATED_SENDER_RE.search(sender or ""):
+        return True
+    domain = _sender_domain(sender)
+    if domain in _BLOCKED_DOMAINS or any(domain.endswith("." + d) for d in _BLOCKED_DOMAINS):
+        return True
+    return _has_bulk_headers(headers)
+
+
+def should_skip(sender: str, subject: str, headers: Optional[List[dict]] = None, receiver: str = "") -> bool:
+    """
+    Return True for incoming mail that is clearly automated or bulk
+    (no-reply senders, mailing-list platforms, List-Unsubscribe / Precedence: bulk
+    headers, newsletter/digest subjects, auto-replies and bounces, or a sender
+    dropped repeatedly this week for the same receiver), so it can be dropped
+    without an LLM call.
+    """
+    if _is_auto_reply(subject, headers):
+        return True
+    # Per receiver: one user's newsletter sender is not blocked for everybody else
+    key = (_sender_address(receiver), _sender_address(sender))
+    with _dropped_senders_lock:
+        if key[1] and _dropped_senders.get(key, 0) >= REPEAT_DROP_LIMIT:
+            return True
+
+    if _is_noise_sender(sender, headers):
+        # Only sender/domain/header drops are learned; a person who once sends
+        # a "weekly update" subject must not end up blocked.
+        if key[1]:
+            with _dropped_senders_lock:
+                _dropped_senders[key] = _dropped_senders.get(key, 0) + 1
+        return True
+    return bool(_BULK_SUBJECT_RE.search(subject or ""))
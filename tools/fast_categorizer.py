@@ -0,0 +1,65 @@
+import re
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Patterns ---
+# Each pattern votes for one category. A message is only pre-screened when
+# exactly one category matches; anything ambiguous falls through to the LLM.
+_GREETING_RE = re.compile(
+    r"^\s*(hi|hello|hey|yo|hello there|good (morning|afternoon|evening)|how are you)\b[\s!.?,]*(there)?[\s!.?]*$",
+    re.I,
+)
+_REMINDER_RE = re.compile(r"\b(remind me|add (a )?(task|todo|to-do)|create (a )?(task|todo|reminder))\b", re.I)
+_SCHEDULE_RE = re.compile(r"\b(schedule|meeting|calendar|reschedule)\b", re.I)
+_AGENT_ACTION_RE = re.compile(r"\b(send|write|generate|summari[sz]e|draft|email)\s+(an\s+|a\s+)?(email|to|the|reply)\b", re.I)
+_USER_ACTION_RE = re.compile(r"\b(I|we)\s+(will|plan to|would like to|are confirming)\b", re.I)
+# No "click here" / "unsubscribe": legitimate newsletters and notifications carry them too.
+_SPAM_RE = re.compile(
+    r"\b(buy now|limited[- ]time offer|limited offer|act now|you('ve| have) won|100% free|risk[- ]free)\b",
+    re.I,
+)
+_FYI_RE = re.compile(r"\b(fyi|for your information|no action (is )?(needed|required))\b", re.I)
+
+
+def is_greeting(content: str) -> bool:
+    """True for a bare greeting ("Hi", "Hello there!", "How are you?")."""
+    return bool(_GREETING_RE.match(content or ""))
+
+
+def fast_categorize(content: str, request_type: str) -> Optional[str]:
+    """
+    Deterministically classify unambiguous messages without calling the LLM.
+
+    Returns one of the categorizer labels, or None when no single rule
+    matches with confidence and the categorizer model should decide.
+    """
+    text = (content or "").strip()
+    if not text:
+        return None
+
+    if request_type == "user_request":
+        if _GREETING_RE.match(text):
+            return "requires_response"
+        votes = {
+            "reminder": bool(_REMINDER_RE.search(text)),
+            "schedule_event": bool(_SCHEDULE_RE.search(text)),
+            "requires_response": bool(_AGENT_ACTION_RE.search(text)),
+        }
+    elif request_type == "incoming_email":
+        votes = {
+            "spam": bool(_SPAM_RE.search(text)),
+            "schedule_event": bool(_SCHEDULE_RE.search(text)),
+            "actionable_task": bool(_USER_ACTION_RE.search(text)),
+            "no_action": bool(_FYI_RE.search(text)),
+        }
+    else:
+        return None
+
+    matched = [category for category, hit in votes.items() if hit]
+    if len(matched) != 1:
+        return None
+
+    logger.debug("Fast categorizer matched %s for %s", matched[0], request_type)
+    return matched[0]
@@ -0,0 +1,6 @@
+def format_email(receiver: str, subject: str, content: str) -> str:
+    """
+    Render email fields in the "To : … / Subject : …" layout the send flow parses.
+    Replaces the former email_format_agent LLM call; the output is identical.
+    """
+    return f"To : {receiver},\n\nSubject : {subject},\n\n{content}"
@@ -0,0 +1,26 @@
+TODO_PREVIEW = "Title: {task_title}\nBody: {task_body}\nDue Date: {due_date_time}"
+
+EVENT_PREVIEW = (
+    "Subject: {subject}\n"
+    "Start DateTime: {start_datetime} {timezone}\n"
+    "End DateTime: {end_datetime} {timezone}\n"
+    "Timezone: {timezone}\n"
+    "Location: {location}\n"
+    "Attendees: {attendees}"
+)
+
+
+def format_todo_preview(todo: dict) -> str:
+    """
+    Render the human-friendly To Do preview from the extracted fields.
+    Replaces the former reminder_todo_formatter_preview_task LLM call.
+    """
+    return TODO_PREVIEW.format(**todo)
+
+
+def format_event_preview(event: dict) -> str:
+    """
+    Render the human-friendly event preview from the extracted fields.
+    Replaces the former event_formatter_preview_task LLM call.
+    """
+    return EVENT_PREVIEW.format(**{**event, "attendees": ", ".join(event.get("attendees") or [])})
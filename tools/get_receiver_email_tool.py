@@ -1,6 +1,8 @@
 import os
 import logging
+import threading
 from functools import lru_cache
+from cachetools import TTLCache
 from msal import ConfidentialClientApplication
 import requests
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -12,7 +14,6 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # --- Logging Configuration ---
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger(__name__)
 
 # --- Metrics ---
@@ -26,6 +27,13 @@ CONTACT_LOOKUP_LATENCY = Histogram(
 # --- Circuit Breaker ---
 contact_lookup_breaker = CircuitBreaker(fail_max=5, reset_timeout=60)
 
+# --- Contact Cache ---
+# Resolved addresses keyed by (sender, normalized contact name); the TTL bounds
+# how long a directory change can go unnoticed.
+CONTACT_CACHE_TTL = int(os.getenv("CONTACT_CACHE_TTL", str(24 * 60 * 60)))
+contact_cache = TTLCache(maxsize=10_000, ttl=CONTACT_CACHE_TTL)
+contact_cache_lock = threading.Lock()
+
 @lru_cache()
 def get_graph_app() -> ConfidentialClientApplication:
     """
@@ -41,14 +49,33 @@ def get_graph_app() -> ConfidentialClientApplication:
         authority=authority
     )
 
+def _contact_cache_key(sender: str, contact_name: str) -> tuple:
+    return (sender.strip().lower(), " ".join(contact_name.split()).lower())
+
 @tool("Enterprise: Look up a contact's email by name from Microsoft Graph contacts list.")
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True)
 def get_contact_email_by_name(sender: str, contact_name: str) -> str:
     """
     Look up and return the email address of a contact (by display name)
     in the contact list of the specified sender (email address).
     Returns None if no matching contact or no alternate email found.
     """
+    key = _contact_cache_key(sender, contact_name)
+    with contact_cache_lock:
+        cached = contact_cache.get(key)
+    if cached is not None:
+        CONTACT_LOOKUP_ATTEMPTS.labels(status="cache_hit").inc()
+        logger.info("Contact email for %s served from cache", contact_name)
+        return cached
+
+    email = fetch_contact_email(sender, contact_name)
+    if email:  # only positive results are cached; a missing contact may be added later
+        with contact_cache_lock:
+            contact_cache[key] = email
+    return email
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True)
+def fetch_contact_email(sender: str, contact_name: str):
+    """Query Microsoft Graph for the contact's email address (uncached)."""
     CONTACT_LOOKUP_ATTEMPTS.labels(status="started").inc()
 
     logger.info("Looking up contact email for %s", contact_name)
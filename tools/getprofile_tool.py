@@ -1,12 +1,20 @@
 import os
 import logging
+import threading
 import requests
+from cachetools import TTLCache
 from msal import ConfidentialClientApplication
 from crewai.tools import tool
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# --- Profile Cache ---
+# Formatted profiles keyed by lowercased email; drafting fetches the same
+# sender's profile on every call, so repeats are served without Graph calls.
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "900"))
+profile_cache = TTLCache(maxsize=2048, ttl=PROFILE_CACHE_TTL)
+profile_cache_lock = threading.Lock()
+
 def get_graph_app():
     return ConfidentialClientApplication(
         client_id=os.getenv("CLIENT_ID"),
@@ -59,12 +67,34 @@ def fetch_user_profile(upn: str, access_token: str) -> dict:
 
     return user_data
 
+def clear_profile_cache(email: str = None) -> None:
+    """Drop one cached profile (e.g. after a profile update), or all of them."""
+    with profile_cache_lock:
+        if email is None:
+            profile_cache.clear()
+        else:
+            profile_cache.pop(email.strip().lower(), None)
+
 @tool("CrewAI: Fetch user profile by email from Graph API")
 def get_user_profile_by_email(email: str) -> str:
     """
     Given a user's email, fetch their profile information (including basic details and profileSettings extension)
     from Microsoft Graph API and return it as a formatted string.
     """
+    key = email.strip().lower()
+    with profile_cache_lock:
+        cached = profile_cache.get(key)
+    if cached is not None:
+        logger.info(f"👤 Profile for {email} served from cache")
+        return cached
+
+    profile_text = fetch_profile_text(email)
+    with profile_cache_lock:
+        profile_cache[key] = profile_text
+    return profile_text
+
+def fetch_profile_text(email: str) -> str:
+    """Fetch and format the profile from Microsoft Graph (uncached)."""
     try:
         logger.info(f"👤 Fetching profile for email: {email}")
         app = get_graph_app()
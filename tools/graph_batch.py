@@ -0,0 +1,68 @@
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+MAX_BATCH_SIZE = 20  # Graph rejects $batch payloads with more than 20 sub-requests
+
+
+@dataclass
+class GraphRequest:
+    """A single sub-request of a Graph JSON batch; `url` is relative to /v1.0."""
+    method: str
+    url: str
+    body: Optional[dict] = None
+    headers: dict = field(default_factory=dict)
+    depends_on: List[str] = field(default_factory=list)
+    id: Optional[str] = None
+
+
+def _envelope(chunk: List[GraphRequest], offset: int) -> dict:
+    items = []
+    for index, req in enumerate(chunk):
+        item = {
+            "id": req.id or str(offset + index + 1),
+            "method": req.method.upper(),
+            "url": req.url,
+        }
+        if req.body is not None:
+            item["body"] = req.body
+            item["headers"] = {"Content-Type": "application/json", **req.headers}
+        elif req.headers:
+            item["headers"] = req.headers
+        if req.depends_on:
+            item["dependsOn"] = req.depends_on
+        items.append(item)
+    return {"requests": items}
+
+
+def batch_execute(graph_requests: List[GraphRequest], access_token: str, timeout: float = 30) -> List[dict]:
+    """
+    Execute Graph requests through POST /v1.0/$batch, 20 per round trip.
+
+    Returns one response dict ({"id", "status", "headers", "body"}) per request,
+    in the same order as `graph_requests`. Requests linked with `depends_on`
+    must fall inside the same chunk of 20.
+    """
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
+    }
+    results = []
+    for offset in range(0, len(graph_requests), MAX_BATCH_SIZE):
+        chunk = graph_requests[offset:offset + MAX_BATCH_SIZE]
+        envelope = _envelope(chunk, offset)
+        resp = requests.post(GRAPH_BATCH_URL, headers=headers, json=envelope, timeout=timeout)
+        if not resp.ok:
+            raise RuntimeError(f"Graph batch failed: {resp.status_code} {resp.text}")
+
+        # Sub-responses may come back in any order; re-align them with the request ids.
+        by_id = {r["id"]: r for r in resp.json().get("responses", [])}
+        for item in envelope["requests"]:
+            results.append(by_id.get(item["id"], {"id": item["id"], "status": None, "body": None}))
+        logger.info(f"Graph batch executed {len(chunk)} requests in one round trip")
+    return results
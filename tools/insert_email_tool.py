@@ -1,11 +1,75 @@
 # insert_email_tool.py
 
+import queue
+import atexit
+import threading
 from crewai.tools import tool
-from db_utils import insert_email
+from db_utils import insert_emails
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class EmailRecordWriter:
+    """
+    Coalescing writer for the Emails table.
+
+    Rows are queued and written by a background thread with one multi-row
+    INSERT whenever `batch_size` rows are waiting or `flush_interval` seconds
+    have passed since the first one, so a burst of summarized emails costs a
+    few DB round trips instead of one per email. Failures are logged.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_size: int = 64, flush_interval: float = 0.05):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="email-insert", daemon=True)
+        self._thread.start()
+
+    def put(self, row: tuple) -> None:
+        self._queue.put(row)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            rows = []
+            item = self._queue.get()
+            try:
+                while item is not self._STOP:
+                    rows.append(item)
+                    if len(rows) == self.batch_size:
+                        break
+                    item = self._queue.get(timeout=self.flush_interval)
+                stopping = item is self._STOP
+            except queue.Empty:
+                pass
+            if rows:
+                self._write(rows)
+
+    def _write(self, rows: list) -> None:
+        mail_ids = [row[1] for row in rows]
+        try:
+            insert_emails(rows)
+            logger.info(f"✅ Inserted {len(rows)} email records: {mail_ids}")
+        except Exception:
+            logger.exception(f"❌ Failed to insert email records for mail_ids {mail_ids}")
+
+    def close(self, timeout: float = 10) -> None:
+        """
+        Stop the writer after everything queued so far, including the batch it
+        is collecting, has been written (called at interpreter exit).
+        """
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+
+# Inserts are coalesced in the background so the summarizer agent doesn't wait on the DB round trip.
+email_record_writer = EmailRecordWriter()
+atexit.register(email_record_writer.close)
+
 @tool("Insert email record into database")
 def insert_email_record(summary: str, id: str, userId: int, subject: str, sender: str,body_preview: str) -> str:
     """
@@ -19,24 +83,16 @@ def insert_email_record(summary: str, id: str, userId: int, subject: str, sender
         sender (str): The sender's email address.
 
     Returns:
-        str: A confirmation message indicating success or failure.
+        str: A confirmation message once the insert has been queued.
     """
     # Basic validation
     if not all([summary, id, userId, subject, sender]):
         return "⚠️ Missing required fields: summary, id, userId, subject, or sender."
 
     try:
-        # Insert into the Emails table
-        new_id = insert_email(
-            user_id=userId,
-            mail_id=id,
-            subject=subject,
-            body_summary=summary,
-            sender=sender,
-            body_detail=body_preview
-            
-        )
-        return f"✅ Inserted email record with ID {new_id}."
+        # Queue the row for the next batched insert; failures are logged.
+        email_record_writer.put((userId, id, subject, summary, sender, body_preview))
+        return f"✅ Queued email record for mail_id '{id}'."
     except Exception as e:
-        logger.exception(f"❌ Failed to insert email record for mail_id '{id}'")
+        logger.exception(f"❌ Failed to queue email record for mail_id '{id}'")
         return f"❌ Error inserting email record: {str(e)}"
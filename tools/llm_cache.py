@@ -0,0 +1,168 @@
+import os
+import time
+import json
+import zlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Mapping, Optional
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+# Prompts routinely embed Graph data (profiles, threads) that can change, so
+# the default stays short; classifier labels are cached longer by SemanticCache.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(60 * 60)))
+
+LLM_CACHE_REQUESTS = Counter("llm_cache_requests_total", "LLM response cache lookups", ["result"])
+
+
+def is_deterministic_call(kwargs: Mapping) -> bool:
+    """
+    True for completions whose answer is fixed by the prompt: temperature 0 or a
+    response_format (classifiers, extractors). Sampled calls such as casual chat
+    and drafting must get a fresh answer every time, so they bypass the cache.
+    """
+    return kwargs.get("temperature") == 0 or kwargs.get("response_format") is not None
+
+
+class PersistentLLMCache:
+    """
+    SQLite-backed response store for LiteLLM, the client CrewAI uses for every
+    model call.
+
+    LiteLLM computes the key itself (a SHA-256 over model, messages, tools and
+    sampling parameters) and calls get_cache/set_cache around each completion.
+    Values are stored as zlib-compressed JSON, never pickle, because the file is
+    shared by every worker process on the host (a restart or a new worker starts
+    warm) and loading it must not execute anything.
+    """
+
+    def __init__(self, db_path: str = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL):
+        self.db_path = db_path
+        self.default_ttl = ttl
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+
+    def get_cache(self, key: str, **kwargs) -> Optional[Any]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        value = None
+        if row:
+            try:
+                value = json.loads(zlib.decompress(row[0]))
+            except (zlib.error, ValueError):
+                logger.warning(f"Unreadable LLM cache entry {key}; treating it as a miss")
+        LLM_CACHE_REQUESTS.labels(result="hit" if value is not None else "miss").inc()
+        return value
+
+    def set_cache(self, key: str, value: Any, **kwargs) -> None:
+        ttl = kwargs.get("ttl") or self.default_ttl
+        try:
+            # LiteLLM stores {"timestamp", "response": <model_dump_json() string>}
+            blob = zlib.compress(json.dumps(value).encode("utf-8"))
+        except TypeError:
+            logger.debug(f"LLM cache value for {key} is not JSON-serializable; not cached")
+            return
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, blob, time.time() + ttl),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def delete_cache(self, key: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def flush_cache(self) -> None:
+        """Drop expired rows; LiteLLM calls this on cache maintenance."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+                conn.commit()
+            finally:
+                conn.close()
+
+    async def async_get_cache(self, key: str, **kwargs) -> Optional[Any]:
+        return self.get_cache(key, **kwargs)
+
+    async def async_set_cache(self, key: str, value: Any, **kwargs) -> None:
+        self.set_cache(key, value, **kwargs)
+
+    async def async_set_cache_pipeline(self, cache_list, **kwargs) -> None:
+        for key, value in cache_list:
+            self.set_cache(key, value, **kwargs)
+
+    async def disconnect(self) -> None:
+        pass
+
+
+def install_llm_cache() -> None:
+    """
+    Put PersistentLLMCache in front of deterministic LiteLLM completions (see
+    is_deterministic_call); no-op when LLM_CACHE_ENABLED is false.
+    """
+    if not LLM_CACHE_ENABLED:
+        return
+    try:
+        import litellm
+        from litellm.caching.caching import Cache
+    except ImportError:
+        logger.warning("LiteLLM not available; LLM response cache disabled")
+        return
+
+    # Cache computes its key from the completion's own kwargs, so every read and
+    # write sees temperature and response_format and can be skipped here.
+    class DeterministicCache(Cache):
+        def get_cache(self, *args, **kwargs):
+            return super().get_cache(*args, **kwargs) if is_deterministic_call(kwargs) else None
+
+        async def async_get_cache(self, *args, **kwargs):
+            return await super().async_get_cache(*args, **kwargs) if is_deterministic_call(kwargs) else None
+
+        def add_cache(self, result, *args, **kwargs):
+            if is_deterministic_call(kwargs):
+                super().add_cache(result, *args, **kwargs)
+
+        async def async_add_cache(self, result, *args, **kwargs):
+            if is_deterministic_call(kwargs):
+                await super().async_add_cache(result, *args, **kwargs)
+
+    cache = DeterministicCache()
+    cache.cache = PersistentLLMCache()
+    litellm.cache = cache
+    logger.info(f"LLM response cache enabled at {LLM_CACHE_PATH} (ttl {LLM_CACHE_TTL}s)")
@@ -0,0 +1,46 @@
+import os
+import atexit
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "64"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "32"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (httpx needs it for HTTP/2)
+        return True
+    except ImportError:
+        return False
+
+
+@lru_cache(maxsize=1)
+def get_llm_http_client():
+    """
+    Process-wide httpx client for model API calls: pooled keep-alive
+    connections (HTTP/2 when the h2 package is installed), so calls reuse
+    open TLS connections instead of handshaking per request.
+    """
+    import httpx
+    client = httpx.Client(
+        http2=_http2_available(),
+        timeout=LLM_HTTP_TIMEOUT,
+        limits=httpx.Limits(max_connections=LLM_HTTP_MAX_CONNECTIONS, max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE),
+    )
+    atexit.register(client.close)
+    return client
+
+
+def install_llm_http_client() -> None:
+    """Route every LiteLLM completion (the client CrewAI uses) through get_llm_http_client()."""
+    try:
+        import litellm
+    except ImportError:
+        logger.warning("LiteLLM not available; shared LLM HTTP client not installed")
+        return
+    litellm.client_session = get_llm_http_client()
+    logger.info(f"Shared LLM HTTP client installed (max {LLM_HTTP_MAX_CONNECTIONS} connections)")
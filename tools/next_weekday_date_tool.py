@@ -1,6 +1,7 @@
 # src/your_project/tools/next_weekday_date_tool.py
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 from crewai.tools import tool
 
 @tool("NextWeekdayDateTool")
@@ -17,6 +18,11 @@ def next_weekday_date_tool(current_date_str: str, weekday_name: str, hour: int,
     Returns:
         ISO format string for next occurrence datetime.
     """
+    return next_weekday_date(current_date_str, weekday_name, hour, minute)
+
+# Pure function of its arguments, so results can be memoized without a TTL.
+@lru_cache(maxsize=1024)
+def next_weekday_date(current_date_str: str, weekday_name: str, hour: int, minute: int) -> str:
     weekday_map = {
         'monday': 0, 'tuesday': 1, 'wednesday': 2,
         'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6
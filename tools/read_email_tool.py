@@ -1,11 +1,12 @@
 import os
 import logging
+from typing import List, Union
 from msal import ConfidentialClientApplication
 import requests
 from crewai.tools import tool
-from db_utils import get_mail_id_by_task_id
+from db_utils import get_mail_id_by_task_id, get_mail_ids_by_task_ids
+from tools.graph_batch import GraphRequest, batch_execute
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def get_graph_app():
@@ -15,13 +16,27 @@ def get_graph_app():
         authority=f"https://login.microsoftonline.com/{os.getenv('TENANT_ID')}"
     )
 
+def get_access_token() -> str:
+    app = get_graph_app()
+    token_resp = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
+    access_token = token_resp.get("access_token")
+    if not access_token:
+        raise RuntimeError("Failed to acquire Graph access token")
+    return access_token
+
 @tool("CrewAI: Read email body using Graph API based on Task ID")
-def read_email_by_task_id(task_id: int, sender_email: str) -> str:
+def read_email_by_task_id(task_id: Union[int, List[int]], sender_email: str) -> str:
     """
     Given a CrewAI Task ID and sender_email, this tool reads the full content of the corresponding email
-    using Microsoft Graph API.
+    using Microsoft Graph API. Given a list of Task IDs, it reads all of their emails in batched
+    Graph requests and returns them one after another, each headed by its Task ID.
     """
     logger.info(f"📨 Task ID: {task_id}")
+    if isinstance(task_id, list):
+        emails = read_emails_by_task_ids(task_id, sender_email)
+        if not emails:
+            raise RuntimeError(f"read_email_by_task_id failed: no emails found for tasks {task_id}")
+        return "\n\n---\n\n".join(f"Task ID: {tid}\n{email}" for tid, email in emails.items())
 
     try:
         logger.info(f"🔎 Reading email for task ID: {task_id}")
@@ -34,11 +49,7 @@ def read_email_by_task_id(task_id: int, sender_email: str) -> str:
         if not sender_email:
             raise EnvironmentError("sender_email must be provided")
 
-        app = get_graph_app()
-        token_resp = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-        access_token = token_resp.get("access_token")
-        if not access_token:
-            raise RuntimeError("Failed to acquire Graph access token")
+        access_token = get_access_token()
 
         headers = {
             "Authorization": f"Bearer {access_token}",
@@ -60,3 +71,34 @@ def read_email_by_task_id(task_id: int, sender_email: str) -> str:
     except Exception as e:
         logger.exception("❌ Error reading email")
         raise RuntimeError(f"read_email_by_task_id failed: {e}")
+
+def read_emails_by_task_ids(task_ids: list, sender_email: str) -> dict:
+    """
+    Read the emails behind several CrewAI Task IDs with Graph $batch requests
+    (20 messages per round trip). Returns {task_id: "Subject: ...\n\n<body>"};
+    tasks without a mail id or whose message could not be fetched are omitted.
+    """
+    if not sender_email:
+        raise EnvironmentError("sender_email must be provided")
+
+    mail_ids = get_mail_ids_by_task_ids(task_ids)
+    if not mail_ids:
+        return {}
+
+    task_order = list(mail_ids)
+    graph_requests = [
+        GraphRequest(method="GET", url=f"/users/{sender_email}/messages/{mail_ids[task_id]}?$select=subject,body")
+        for task_id in task_order
+    ]
+    responses = batch_execute(graph_requests, get_access_token())
+
+    emails = {}
+    for task_id, resp in zip(task_order, responses):
+        if resp.get("status") != 200:
+            logger.warning(f"⚠️ Failed to fetch email for task {task_id}: {resp.get('status')}")
+            continue
+        email_data = resp.get("body") or {}
+        subject = email_data.get("subject", "(No Subject)")
+        body = email_data.get("body", {}).get("content", "")
+        emails[task_id] = f"Subject: {subject}\n\n{body}"
+    return emails
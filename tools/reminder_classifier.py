@@ -0,0 +1,114 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from tools.semantic_cache import embed, embed_batch
+
+logger = logging.getLogger(__name__)
+
+# --- Keyword stage ---
+_EVENT_RE = re.compile(
+    r"\b(meeting|meet|call|zoom|teams|calendar|schedule|appointment|invite|attendees?|conference|interview|"
+    r"lunch|dinner|webinar|from \d{1,2}(:\d{2})?\s*(am|pm)? to)\b",
+    re.I,
+)
+_TIME_RE = re.compile(r"\b\d{1,2}(:\d{2})?\s*(am|pm)\b|\bat \d{1,2}(:\d{2})?\b", re.I)
+_TODO_RE = re.compile(r"\b(remind|reminder|todo|to-do|task|buy|finish|send|submit|pay|call back|pick up|renew)\b", re.I)
+MIN_VOTE_MARGIN = 2
+
+# --- Embedding stage ---
+# Labelled examples whose mean embeddings act as class centroids when the
+# keyword votes are too close to call.
+_EXAMPLES = {
+    "event": [
+        "Schedule a meeting with John tomorrow at 3pm",
+        "Set up a call with the design team on Friday morning",
+        "Book a Teams meeting with Sarah next Monday from 10 to 11",
+        "Create a calendar event for the quarterly review on June 5",
+        "Invite the sales team to a planning session on Thursday",
+        "Arrange an appointment with the dentist next Tuesday at 9am",
+        "Put a lunch with the client on my calendar for Wednesday noon",
+        "Organize a Zoom call with investors next week",
+        "Add the product launch webinar to my calendar on the 12th",
+        "Set a one-on-one with my manager every Monday at 10",
+        "Block two hours on Friday afternoon for the workshop",
+        "Schedule an interview with the candidate on Thursday at 2pm",
+        "Create an event for the team offsite in the conference room",
+        "Plan a sync with marketing tomorrow from 4 to 5 pm",
+        "Book a demo with Acme Corp on the 20th at 11am",
+        "Set up a standup with the engineers every morning at 9",
+        "Add dinner with Alex on Saturday at 7pm to my calendar",
+        "Send a calendar invite for the board meeting next month",
+        "Schedule a follow-up call with the vendor on Monday",
+        "Reserve the meeting room for the training session on Tuesday",
+    ],
+    "todo": [
+        "Remind me to submit the expense report by Friday",
+        "Add a task to finish the slide deck",
+        "Remind me to buy milk on the way home",
+        "Create a todo to renew my passport",
+        "I need to pay the electricity bill tomorrow",
+        "Remind me to send the contract to legal",
+        "Add to my to-do list: review the pull request",
+        "Don't let me forget to call back the landlord",
+        "Make a task to update the project documentation",
+        "Remind me to water the plants this evening",
+        "Create a reminder to follow up on the invoice next week",
+        "Add a task to prepare the quarterly report",
+        "Remind me to pick up the dry cleaning",
+        "Todo: book flights for the conference",
+        "Remind me to back up my laptop on Sunday",
+        "Add a task to reply to the customer survey",
+        "Create a task to order new business cards",
+        "Remind me to check the server logs tomorrow morning",
+        "Note to self: clean up the shared drive",
+        "Add a reminder to submit my timesheet",
+    ],
+}
+_LABELS = tuple(_EXAMPLES)
+MIN_CENTROID_MARGIN = 0.05
+
+
+@lru_cache(maxsize=1)
+def _centroids() -> Optional[np.ndarray]:
+    """(n_labels, dim) float32 matrix of normalized class centroids, or None without a model."""
+    rows = []
+    for label in _LABELS:
+        vectors = embed_batch(_EXAMPLES[label])
+        if vectors is None:
+            return None
+        centroid = vectors.mean(axis=0)
+        rows.append(centroid / np.linalg.norm(centroid))
+    return np.vstack(rows).astype(np.float32)
+
+
+def classify_reminder(question: str) -> Optional[str]:
+    """
+    Classify a reminder request as 'todo' or 'event' without an LLM.
+
+    Keyword votes decide when they differ by at least MIN_VOTE_MARGIN; otherwise
+    the nearest embedding centroid decides if it is clearly closer. Returns None
+    when neither stage is confident, so reminder_agent can decide.
+    """
+    text = (question or "").strip()
+    if not text:
+        return None
+
+    event_votes = len(_EVENT_RE.findall(text)) + len(_TIME_RE.findall(text))
+    todo_votes = len(_TODO_RE.findall(text))
+    if abs(event_votes - todo_votes) >= MIN_VOTE_MARGIN:
+        return "event" if event_votes > todo_votes else "todo"
+
+    centroids = _centroids()
+    vector = embed(text) if centroids is not None else None
+    if vector is None:
+        return None
+    scores = centroids @ vector
+    best, runner_up = np.argsort(scores)[::-1][:2]
+    if scores[best] - scores[runner_up] < MIN_CENTROID_MARGIN:
+        return None
+    logger.debug("Reminder classifier matched %s by centroid (%.3f)", _LABELS[best], scores[best])
+    return _LABELS[best]
@@ -9,7 +9,6 @@ from crewai.tools import tool
 INLINE_ATTACHMENT_LIMIT = 4 * 1024 * 1024
 CHUNK_SIZE = 5 * 1024 * 1024
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -0,0 +1,298 @@
+import os
+import re
+import time
+import logging
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "semantic_cache.sqlite3")
+EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("SEMANTIC_CACHE_DEVICE")  # e.g. "cuda", "cpu"; auto-detected when unset
+EMBEDDING_BATCH_SIZE = int(os.getenv("SEMANTIC_CACHE_BATCH_SIZE", "256"))
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_TTL = 24 * 60 * 60
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Exact-match key: lowercased, punctuation dropped, whitespace collapsed ("Hi!" and "hi." match)."""
+    return " ".join(_PUNCTUATION_RE.sub(" ", (text or "").lower()).split())
+
+
+def _embedding_device() -> str:
+    if EMBEDDING_DEVICE:
+        return EMBEDDING_DEVICE
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """
+    Lazily load the sentence-transformers model (384-dim MiniLM by default).
+    Returns None when the model cannot be loaded, in which case the cache only
+    serves exact-match hits.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBEDDING_MODEL, device=_embedding_device())
+    except Exception:
+        logger.warning("Semantic cache embedding model unavailable; using exact matches only", exc_info=True)
+        return None
+
+
+def embed(text: str) -> Optional[np.ndarray]:
+    """Return the L2-normalized float32 embedding of text, or None without a model."""
+    model = get_embedding_model()
+    if model is None:
+        return None
+    vector = model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+    return vector.astype(np.float32)
+
+
+def embed_batch(texts: List[str]) -> Optional[np.ndarray]:
+    """
+    Embed many texts in one encode call (batched on the GPU when available).
+    Returns an (n, dim) float32 matrix of normalized rows, or None without a model.
+    """
+    model = get_embedding_model()
+    if model is None or not texts:
+        return None
+    vectors = model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True)
+    return vectors.astype(np.float32)
+
+
+class SemanticCache:
+    """
+    Embedding-keyed response cache for deterministic LLM calls (classifiers).
+
+    Lookups first try an exact match on the normalized prompt (see
+    normalize_prompt), then the nearest stored prompt by cosine similarity
+    (inner product over normalized embeddings). Embeddings live in one
+    preallocated matrix that grows by doubling, so a lookup is a single
+    matrix-vector product. Entries are persisted to SQLite so they survive
+    restarts and expire after `ttl` seconds; expired rows are pruned from
+    SQLite and from memory together, every PRUNE_INTERVAL seconds.
+    """
+
+    INITIAL_CAPACITY = 1024
+    PRUNE_INTERVAL = 60 * 60
+
+    def __init__(self, namespace: str, threshold: float = DEFAULT_THRESHOLD,
+                 ttl: float = DEFAULT_TTL, db_path: str = SEMANTIC_CACHE_PATH):
+        self.namespace = namespace
+        self.threshold = threshold
+        self.ttl = ttl
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._clear()
+        self._last_prune = 0.0
+        self._init_db()
+        self._load()
+
+    def _clear(self):
+        self._rows = {}        # normalized prompt -> row
+        self._prompts = []     # row -> normalized prompt
+        self._labels = []
+        self._created = np.empty(self.INITIAL_CAPACITY, dtype=np.float64)
+        self._matrix = None    # (capacity, dim); allocated with the first embedding. Rows without one stay zero.
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS semantic_cache (
+                    namespace TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    embedding BLOB,
+                    label TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, prompt)
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _load(self):
+        with self._lock:
+            self._prune()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT prompt, embedding, label, created_at FROM semantic_cache "
+                "WHERE namespace = ? AND created_at > ?",
+                (self.namespace, time.time() - self.ttl),
+            ).fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            for prompt, blob, label, created_at in rows:
+                vector = np.frombuffer(blob, dtype=np.float32) if blob else None
+                self._append(prompt, vector, label, created_at)
+
+    def _append(self, prompt, vector, label, created_at):
+        row = len(self._prompts)
+        capacity = len(self._created)
+        if row == capacity:
+            capacity *= 2
+            self._created = np.resize(self._created, capacity)
+            if self._matrix is not None:
+                matrix = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+                matrix[:row] = self._matrix[:row]
+                self._matrix = matrix
+        if vector is not None and self._matrix is None:
+            self._matrix = np.zeros((capacity, vector.shape[0]), dtype=np.float32)
+        if self._matrix is not None:
+            self._matrix[row] = vector if vector is not None else 0.0
+        self._created[row] = created_at
+        self._prompts.append(prompt)
+        self._labels.append(label)
+        self._rows[prompt] = row
+
+    def _remove(self, row: int) -> None:
+        """Drop a row by moving the last row into its place."""
+        del self._rows[self._prompts[row]]
+        last = len(self._prompts) - 1
+        if row != last:
+            self._prompts[row] = self._prompts[last]
+            self._labels[row] = self._labels[last]
+            self._created[row] = self._created[last]
+            if self._matrix is not None:
+                self._matrix[row] = self._matrix[last]
+            self._rows[self._prompts[row]] = row
+        self._prompts.pop()
+        self._labels.pop()
+
+    def _prune(self) -> None:
+        """Delete expired entries from SQLite and evict them from memory. Caller holds the lock."""
+        now = time.time()
+        self._last_prune = now
+        cutoff = now - self.ttl
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM semantic_cache WHERE namespace = ? AND created_at <= ?", (self.namespace, cutoff))
+            conn.commit()
+        finally:
+            conn.close()
+        # Highest rows first, so a row moved into a freed slot has already been checked
+        for row in np.flatnonzero(self._created[:len(self._prompts)] <= cutoff)[::-1]:
+            self._remove(int(row))
+
+    def _exact(self, prompt: str) -> Optional[str]:
+        prompt = normalize_prompt(prompt)
+        with self._lock:
+            row = self._rows.get(prompt)
+            if row is not None and time.time() - self._created[row] < self.ttl:
+                return self._labels[row]
+        return None
+
+    def _nearest(self, vector: Optional[np.ndarray]) -> Optional[str]:
+        with self._lock:
+            size = len(self._prompts)
+            if vector is None or self._matrix is None or not size:
+                return None
+            scores = self._matrix[:size] @ vector
+            scores[self._created[:size] <= time.time() - self.ttl] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                logger.info("Semantic cache hit (%s, score=%.3f)", self.namespace, scores[best])
+                return self._labels[best]
+        return None
+
+    def _lookup(self, prompt: str):
+        """Return (label, embedding); the embedding is reused by set() on a miss."""
+        label = self._exact(prompt)
+        if label is not None:
+            return label, None
+        vector = embed(prompt)
+        return self._nearest(vector), vector
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Return the cached label for prompt (or a semantically similar prompt), if fresh."""
+        label, _ = self._lookup(prompt)
+        return label
+
+    def get_many(self, prompts: List[str]) -> List[Optional[str]]:
+        """
+        Look up many prompts at once (e.g. a mailbox sweep). All prompts without
+        an exact hit are embedded in a single batched encode call.
+        """
+        labels = [self._exact(prompt) for prompt in prompts]
+        misses = [i for i, label in enumerate(labels) if label is None]
+        vectors = embed_batch([prompts[i] for i in misses])
+        if vectors is not None:
+            for i, vector in zip(misses, vectors):
+                labels[i] = self._nearest(vector)
+        return labels
+
+    def set(self, prompt: str, label: str, vector: Optional[np.ndarray] = None) -> None:
+        """Store label for prompt in memory and in SQLite."""
+        if vector is None:
+            vector = embed(prompt)
+        prompt = normalize_prompt(prompt)
+        created_at = time.time()
+        with self._lock:
+            if created_at - self._last_prune >= self.PRUNE_INTERVAL:
+                self._prune()
+            if prompt in self._rows:
+                self._remove(self._rows[prompt])
+            self._append(prompt, vector, label, created_at)
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO semantic_cache (namespace, prompt, embedding, label, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, prompt, vector.tobytes() if vector is not None else None, label, created_at),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def get_or_call(self, prompt: str, llm_fn: Callable[[], str],
+                    accept: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Return the cached label for prompt, or call llm_fn() and cache its result.
+        When `accept` is given, only results it approves are stored.
+        """
+        cached, vector = self._lookup(prompt)
+        if cached is not None:
+            return cached
+
+        label = llm_fn()
+        if accept is None or accept(label):
+            self.set(prompt, label, vector)
+        return label
+
+    def invalidate(self, prompt: Optional[str] = None) -> None:
+        """Drop one prompt from the cache, or the whole namespace when prompt is None."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                if prompt is None:
+                    conn.execute("DELETE FROM semantic_cache WHERE namespace = ?", (self.namespace,))
+                    self._clear()
+                else:
+                    prompt = normalize_prompt(prompt)
+                    conn.execute(
+                        "DELETE FROM semantic_cache WHERE namespace = ? AND prompt = ?",
+                        (self.namespace, prompt),
+                    )
+                    if prompt in self._rows:
+                        self._remove(self._rows[prompt])
+                conn.commit()
+            finally:
+                conn.close()
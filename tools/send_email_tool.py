@@ -9,7 +9,6 @@ from crewai.tools import tool
 import urllib.parse
 
 # Logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 INLINE_ATTACHMENT_LIMIT = 4 * 1024 * 1024  # 4MB